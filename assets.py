@@ -0,0 +1,94 @@
+"""
+Registry of the textures and sounds the game uses.
+
+Everything is decoded once at startup and handed out as shared handles,
+so nothing is read from disk while playing. The textures are packed into
+a single atlas that all sprite lists draw from. Sounds are decoded on a
+background thread and played through a SoundManager, see sounds.py.
+"""
+
+import time
+
+import arcade
+
+from definitions import DEFINITIONS
+from particles import EMITTERS
+from sounds import SoundManager
+from simulation import PLAYER_GRAPHICS, POWERUP_GRAPHICS
+
+PLAYER_DAMAGE_GRAPHICS = "images/playerShip1_red.png"
+POWERUP_EXTRA_LIFE_GRAPHICS = "images/Power-ups/powerupRed_shield.png"
+POWERUP_EXTRA_SCORE_GRAPHICS = "images/Power-ups/powerupBlue_star.png"
+
+PICK_UP_SOUND = ":resources:sounds/upgrade4.wav"
+DASH_SOUND = ":resources:sounds/upgrade1.wav"
+
+TEXTURES = [
+    PLAYER_GRAPHICS,
+    PLAYER_DAMAGE_GRAPHICS,
+    POWERUP_GRAPHICS,
+    POWERUP_EXTRA_LIFE_GRAPHICS,
+    POWERUP_EXTRA_SCORE_GRAPHICS,
+] + sorted(set(DEFINITIONS.graphics.values())) + sorted(
+    set(graphics for emitter in EMITTERS.values() for graphics in emitter["graphics"]))
+
+SOUNDS = [
+    PICK_UP_SOUND,
+    DASH_SOUND,
+]
+
+ATLAS_SIZE = (512, 512)
+
+
+class AssetRegistry:
+    """
+    Loads every asset once and keeps track of how long it took
+    """
+
+    def __init__(self):
+        self.textures = {}
+        self.sounds = SoundManager(SOUNDS)
+        self.atlas = None
+
+        # seconds it took to load each asset, in load order
+        self.load_times = {}
+
+    def load(self):
+        """
+        Decode all textures and start decoding the sounds, doesn't need a window
+        """
+        self.sounds.start()
+
+        for path in TEXTURES:
+            start = time.perf_counter()
+            self.textures[path] = arcade.load_texture(path)
+            self.load_times[path] = time.perf_counter() - start
+
+    def build_atlas(self):
+        """
+        Pack all textures into one atlas, needs an open window
+        """
+        start = time.perf_counter()
+        self.atlas = arcade.TextureAtlas(ATLAS_SIZE, textures=list(self.textures.values()))
+        self.load_times["texture atlas"] = time.perf_counter() - start
+
+    def texture(self, path):
+        return self.textures[path]
+
+    def play_sound(self, path):
+        return self.sounds.play(path)
+
+    def report(self, time_to_first_frame=None):
+        """
+        Load times as text, one asset per line
+        """
+        lines = ["{:8.2f} ms  {}".format(seconds * 1000, name) for name, seconds in self.load_times.items()]
+        lines.append("{:8.2f} ms  total asset loading".format(sum(self.load_times.values()) * 1000))
+        # sounds are decoded in the background, next to the above
+        sound_times = dict(self.sounds.load_times)
+        lines += ["{:8.2f} ms  {} (background)".format(seconds * 1000, name) for name, seconds in sound_times.items()]
+        if not self.sounds.loaded:
+            lines.append("            {} of {} sounds still decoding".format(len(sound_times), len(SOUNDS)))
+        if time_to_first_frame is not None:
+            lines.append("{:8.2f} ms  time to first frame".format(time_to_first_frame * 1000))
+        return "\n".join(lines)
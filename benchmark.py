@@ -0,0 +1,212 @@
+"""
+Benchmarks of the simulation at growing obstacle counts.
+
+Every run is a headless session with a fixed seed and a fixed bot, so
+runs on the same commit do the same work. The player can't die during
+a benchmark. For each obstacle count it measures the cost per tick of
+the whole step and of collisions, obstacle updates and spawning, the
+cost of a level transition, and the peak memory used. The bytes each
+kind of entity takes are recorded too. Results are written as JSON:
+
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json
+    python benchmark.py --compare before.json after.json
+
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+from profiler import Profiler
+from simulation import LEVEL_OBSTACLE_GROWTH, SIMULATION_STEP, ObstacleStore, PowerUpState, RandomBot, Simulation
+
+OBSTACLE_COUNTS = (50, 500, 5000, 20000, 50000, 100000)
+SEED = 1
+TICKS = 300
+# level transitions timed per obstacle count
+LEVEL_TRANSITIONS = 10
+# ticks run while tracing memory, tracing slows everything down
+MEMORY_TICKS = 30
+
+# profiler scopes reported per tick
+PHASES = ("collisions", "obstacles", "spawning")
+# entities created to measure the memory of one
+ENTITY_SAMPLES = 10000
+
+
+def session(obstacle_count, profiler=None):
+    """
+    A session with obstacle_count obstacles on screen and a player that can't die
+    """
+    simulation = Simulation(SEED, profiler=profiler, obstacle_amount=obstacle_count)
+    simulation.player.player_lives = 10 ** 9
+    return simulation
+
+
+def play(simulation, ticks):
+    bot = RandomBot(seed=SEED)
+    profiler = simulation.profiler
+    for tick in range(ticks):
+        simulation.step(SIMULATION_STEP, bot(simulation))
+        profiler.end_frame()
+
+
+def statistics(seconds):
+    """
+    mean, p50, p95 and p99 of a list of durations, in milliseconds
+    """
+    milliseconds = np.array(seconds) * 1000
+    p50, p95, p99 = np.percentile(milliseconds, (50, 95, 99))
+    return {"mean": float(milliseconds.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+def benchmark(obstacle_count, ticks=TICKS):
+    """
+    All measurements for one obstacle count, as a dict
+    """
+    result = {"obstacles": obstacle_count, "ticks": ticks}
+
+    profiler = Profiler(window=ticks)
+    simulation = session(obstacle_count, profiler)
+    # the first frame also counts the setup above
+    profiler.end_frame()
+    profiler.history["frame"].clear()
+    play(simulation, ticks)
+
+    result["tick_ms"] = statistics(profiler.history["frame"])
+    for phase in PHASES:
+        result[phase + "_ms"] = statistics(profiler.history[phase])
+
+    # new_level throws the obstacles away and spawns new ones
+    transitions = []
+    for i in range(LEVEL_TRANSITIONS):
+        # new_level adds LEVEL_OBSTACLE_GROWTH obstacles per level so far, keep the count the same
+        simulation.number_of_obstacles = obstacle_count - LEVEL_OBSTACLE_GROWTH * simulation.current_level
+        start = time.perf_counter()
+        simulation.new_level()
+        transitions.append(time.perf_counter() - start)
+    result["new_level_ms"] = statistics(transitions)
+
+    tracemalloc.start()
+    simulation = session(obstacle_count)
+    play(simulation, MEMORY_TICKS)
+    result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return result
+
+
+def entity_bytes():
+    """
+    Bytes one obstacle, power-up and timer take
+    """
+    simulation = Simulation(SEED)
+
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    powerups = [PowerUpState(PowerUpState.EXTRA_LIFE, i, float(i), float(i)) for i in range(ENTITY_SAMPLES)]
+    powerup_bytes = (tracemalloc.get_traced_memory()[0] - start) / ENTITY_SAMPLES
+
+    start = tracemalloc.get_traced_memory()[0]
+    timers = [simulation.timers.schedule(1, simulation.end_damage) for i in range(ENTITY_SAMPLES)]
+    timer_bytes = (tracemalloc.get_traced_memory()[0] - start) / ENTITY_SAMPLES
+    tracemalloc.stop()
+
+    del powerups, timers
+    return {
+        "obstacle": sum(np.dtype(dtype).itemsize for name, dtype in ObstacleStore.FIELDS),
+        "powerup": powerup_bytes,
+        "timer": timer_bytes,
+    }
+
+
+def commit():
+    """
+    The git commit being benchmarked, None outside of a git checkout
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path, after_path):
+    """
+    Print how the means changed between two result files
+    """
+    with open(before_path) as f:
+        before_report = json.load(f)
+    with open(after_path) as f:
+        after_report = json.load(f)
+
+    for kind, new in after_report.get("entity_bytes", {}).items():
+        old = before_report.get("entity_bytes", {}).get(kind)
+        if old:
+            print("{:<10} {:8.1f} -> {:8.1f} bytes {:+7.1f}%".format(kind, old, new, (new - old) / old * 100))
+
+    before = {result["obstacles"]: result for result in before_report["results"]}
+    after = {result["obstacles"]: result for result in after_report["results"]}
+
+    metrics = ["tick_ms"] + [phase + "_ms" for phase in PHASES] + ["new_level_ms"]
+    print("{:>10} {:<16} {:>10} {:>10} {:>8}".format("obstacles", "metric", "before", "after", "change"))
+    for count in sorted(set(before) & set(after)):
+        for metric in metrics:
+            old = before[count][metric]["mean"]
+            new = after[count][metric]["mean"]
+            change = (new - old) / old * 100 if old else 0
+            print("{:>10} {:<16} {:10.3f} {:10.3f} {:+7.1f}%".format(count, metric, old, new, change))
+        old = before[count]["peak_memory_bytes"]
+        new = after[count]["peak_memory_bytes"]
+        change = (new - old) / old * 100 if old else 0
+        print("{:>10} {:<16} {:10.1f} {:10.1f} {:+7.1f}%".format(
+            count, "peak_memory_mb", old / 2 ** 20, new / 2 ** 20, change))
+
+
+def main():
+    """
+    Main method
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the simulation at growing obstacle counts")
+    parser.add_argument("--counts", type=int, nargs="+", default=OBSTACLE_COUNTS, help="obstacle counts to run")
+    parser.add_argument("--ticks", type=int, default=TICKS, help="ticks per obstacle count")
+    parser.add_argument("--output", metavar="FILE", default=None, help="write the results here instead of stdout")
+    parser.add_argument("--compare", metavar="FILE", nargs=2, default=None,
+                        help="compare two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = []
+    for count in args.counts:
+        start = time.perf_counter()
+        results.append(benchmark(count, args.ticks))
+        print("{} obstacles done in {:.1f} s".format(count, time.perf_counter() - start), flush=True)
+
+    report = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "seed": SEED,
+        "entity_bytes": entity_bytes(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Spatial hash used to find what is near the player without looking at
+every obstacle and power-up.
+"""
+
+import numpy as np
+
+# Cell keys pack the column into the high bits and the row into the low bits
+KEY_ROW_BITS = 16
+KEY_ROW_OFFSET = 1 << (KEY_ROW_BITS - 1)
+# Layers keep separate worlds apart in one hash, they go above the column
+KEY_LAYER_BITS = 40
+
+
+class SpatialHash:
+    """
+    Uniform grid of buckets, each holding the items whose center is inside the cell.
+
+    Items are anything hashable, e.g. slots of an ObstacleStore. The owner keeps
+    track of the key each item was added with and calls move when it changes,
+    so only items crossing a cell border cost anything per tick.
+
+    Every key and query can be given a layer, items in different layers
+    never see each other.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.buckets = {}
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.buckets.values())
+
+    def key(self, x, y, layer=0):
+        """
+        Key of the cell containing a point
+        """
+        column = int(x // self.cell_size)
+        row = int(y // self.cell_size)
+        return (layer << KEY_LAYER_BITS) + (column << KEY_ROW_BITS) + row + KEY_ROW_OFFSET
+
+    def keys(self, x, y, layer=0):
+        """
+        Keys of the cells containing arrays of points, layer can be an array too
+        """
+        columns = np.floor_divide(x, self.cell_size).astype(np.int64)
+        rows = np.floor_divide(y, self.cell_size).astype(np.int64)
+        return np.left_shift(layer, KEY_LAYER_BITS) + (columns << KEY_ROW_BITS) + rows + KEY_ROW_OFFSET
+
+    def clear(self):
+        self.buckets.clear()
+
+    def add(self, item, key):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            self.buckets[key] = {item}
+        else:
+            bucket.add(item)
+
+    def remove(self, item, key):
+        bucket = self.buckets[key]
+        bucket.discard(item)
+        if not bucket:
+            del self.buckets[key]
+
+    def move(self, item, old_key, new_key):
+        self.remove(item, old_key)
+        self.add(item, new_key)
+
+    def query(self, x, y, reach, layer=0):
+        """
+        Items in all cells touching the square of half size reach around a point
+        """
+        first_column = int((x - reach) // self.cell_size)
+        last_column = int((x + reach) // self.cell_size)
+        first_row = int((y - reach) // self.cell_size)
+        last_row = int((y + reach) // self.cell_size)
+
+        found = []
+        buckets = self.buckets
+        for column in range(first_column, last_column + 1):
+            base = (layer << KEY_LAYER_BITS) + (column << KEY_ROW_BITS) + KEY_ROW_OFFSET
+            for row in range(first_row, last_row + 1):
+                bucket = buckets.get(base + row)
+                if bucket:
+                    found.extend(bucket)
+        return found
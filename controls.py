@@ -0,0 +1,186 @@
+"""
+Keyboard and joystick input as a stream of timestamped events.
+
+The window pushes an event into an InputBuffer for every key press and
+release and every joystick axis motion, nothing is polled. Events that
+change nothing are filtered out as they come in: key repeats, axis
+motion inside the deadzone and axis jitter smaller than what a replay
+can store. The rest wait in a ring buffer until the simulation reads
+them.
+
+Every tick InputState reads the events up to the time the tick ends and
+turns them into the Inputs of that tick. When one update runs several
+ticks, each one gets the events that happened during it rather than
+all of them getting the keys held at the end, and a key tapped and let
+go between two ticks still counts for a tick. The recorded inputs of a
+replay are timed the same way.
+
+The buffer has one writer and one reader, so it needs no lock: the
+writer only moves head after the event is written, and the reader only
+moves tail after it is read. That holds with the simulation on its own
+thread too, see simulation_thread.py.
+"""
+
+import time
+
+import numpy as np
+
+from replay import JOYSTICK_SCALE
+from simulation import Inputs
+
+# what an event is about
+LEFT = 0
+RIGHT = 1
+UP = 2
+DOWN = 3
+DASH = 4
+# both joystick axes at once
+AXES = 5
+BUTTONS = (LEFT, RIGHT, UP, DOWN, DASH)
+
+# events waiting for the simulation, more are dropped
+INPUT_BUFFER_SIZE = 256
+# joystick axes closer to the center than this are read as centered
+JOYSTICK_DEADZONE = 0.2
+
+
+class InputBuffer:
+    """
+    A ring buffer of input events, each a time, a code and an x, y value.
+
+    Keys are x 1 when pressed and 0 when released, AXES events hold both
+    joystick axes.
+    """
+
+    def __init__(self, capacity=INPUT_BUFFER_SIZE, deadzone=JOYSTICK_DEADZONE):
+        self.capacity = capacity
+        self.deadzone = deadzone
+
+        self.time = np.zeros(capacity, np.float64)
+        self.code = np.zeros(capacity, np.int8)
+        self.x = np.zeros(capacity, np.float32)
+        self.y = np.zeros(capacity, np.float32)
+        # events ever written and read, slot is the count modulo capacity
+        self.head = 0
+        self.tail = 0
+
+        # what the writer last pushed, to filter out events that change nothing
+        self.pressed = set()
+        self.last_axes = (0, 0)
+
+        # events pushed, filtered out and dropped because the buffer was full
+        self.received = 0
+        self.filtered = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self.head - self.tail
+
+    def push(self, code, x=0.0, y=0.0, timestamp=None):
+        """
+        Add an event without filtering, returns False if the buffer is full
+        """
+        if self.head - self.tail >= self.capacity:
+            self.dropped += 1
+            return False
+        slot = self.head % self.capacity
+        self.time[slot] = timestamp if timestamp is not None else time.perf_counter()
+        self.code[slot] = code
+        self.x[slot] = x
+        self.y[slot] = y
+        # only now the reader sees the event
+        self.head += 1
+        return True
+
+    def press(self, code, timestamp=None):
+        self.received += 1
+        if code in self.pressed:
+            # key repeat
+            self.filtered += 1
+            return
+        # a dropped press is tried again by the next key repeat
+        if self.push(code, 1, 0, timestamp):
+            self.pressed.add(code)
+
+    def release(self, code, timestamp=None):
+        self.received += 1
+        if code not in self.pressed:
+            self.filtered += 1
+            return
+        if self.push(code, 0, 0, timestamp):
+            self.pressed.discard(code)
+
+    def axes(self, x, y, timestamp=None):
+        """
+        Add the joystick's position, unless it is as good as the last one
+        """
+        self.received += 1
+        if x * x + y * y < self.deadzone * self.deadzone:
+            x = y = 0
+        # finer changes wouldn't survive a replay anyway
+        x = round(x * JOYSTICK_SCALE) / JOYSTICK_SCALE
+        y = round(y * JOYSTICK_SCALE) / JOYSTICK_SCALE
+        if (x, y) == self.last_axes:
+            self.filtered += 1
+            return
+        if self.push(AXES, x, y, timestamp):
+            self.last_axes = (x, y)
+
+    def read(self, until):
+        """
+        (code, x, y) of the events up to perf_counter time until, oldest first
+        """
+        events = []
+        head = self.head
+        while self.tail < head:
+            slot = self.tail % self.capacity
+            if self.time[slot] > until:
+                break
+            events.append((int(self.code[slot]), float(self.x[slot]), float(self.y[slot])))
+            self.tail += 1
+        return events
+
+    def clear(self):
+        """
+        Forget the waiting events, only call it from the reader
+        """
+        self.tail = self.head
+
+
+class InputState:
+    """
+    The buttons held and the joystick position, as the simulation sees them
+    """
+
+    def __init__(self, joystick=False):
+        self.held = [False] * len(BUTTONS)
+        # None without a joystick, like Inputs
+        self.joystick_x = 0.0 if joystick else None
+        self.joystick_y = 0.0 if joystick else None
+
+    def inputs(self, buffer, until=None):
+        """
+        Inputs of a tick ending at perf_counter time until, reading the buffer's events up to then
+        """
+        until = until if until is not None else time.perf_counter()
+        # pressed during the tick, held for it even if already let go
+        pressed = [False] * len(BUTTONS)
+        for code, x, y in buffer.read(until):
+            if code == AXES:
+                self.joystick_x = x
+                self.joystick_y = y
+            else:
+                self.held[code] = bool(x)
+                pressed[code] = pressed[code] or bool(x)
+
+        held = [held or pressed for held, pressed in zip(self.held, pressed)]
+        return Inputs(
+            left=held[LEFT],
+            right=held[RIGHT],
+            up=held[UP],
+            down=held[DOWN],
+            # a dash is a single key press
+            dash=pressed[DASH],
+            joystick_x=self.joystick_x,
+            joystick_y=self.joystick_y,
+        )
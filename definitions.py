@@ -0,0 +1,118 @@
+"""
+Obstacle types and levels, defined in obstacles.json.
+
+The file is read once when the game starts and compiled into flat
+NumPy tables: the direction vectors of all types in one array, where
+each type's vectors start in it, the scale range of every type, and
+one row of cumulative weights per spawn table. Spawning a batch of
+obstacles then only indexes these tables, with no dicts or per obstacle
+choices.
+
+An obstacle type is its graphics, the name of a set of directions it
+can fly in and the range of its scale, in whole multiples of SPRITE_SCALING.
+The spawn tables give the weight of every type from a level on, the
+last table before a level applies to it. A new type only needs an entry
+under "types" and a weight in the spawn tables it should appear in.
+
+Type ids start at 1 and follow the order of the file.
+"""
+
+import json
+import os
+
+import numpy as np
+
+DEFINITIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "obstacles.json")
+# largest scale, multiplayer sends scales as one byte
+MAX_SCALE = 255
+
+
+class ObstacleDefinitions:
+    """
+    The lookup tables compiled from a definitions dict, as read from obstacles.json
+    """
+
+    def __init__(self, definitions):
+        directions = definitions["directions"]
+        types = definitions["types"]
+        if not types:
+            raise ValueError("no obstacle types defined")
+
+        self.names = list(types)
+        self.type_ids = np.arange(1, len(types) + 1)
+        # tables indexed by type id
+        size = len(types) + 1
+        self.graphics = {}
+        self.scale_min = np.zeros(size, np.int64)
+        self.scale_max = np.zeros(size, np.int64)
+        self.direction_start = np.zeros(size, np.int64)
+        self.direction_count = np.zeros(size, np.int64)
+
+        vectors = []
+        for t, name in zip(self.type_ids.tolist(), self.names):
+            obstacle_type = types[name]
+            direction_set = obstacle_type["directions"]
+            if direction_set not in directions:
+                raise ValueError("obstacle type {} has unknown directions {}".format(name, direction_set))
+            self.graphics[t] = obstacle_type["graphics"]
+            # whole multiples only, multiplayer sends the scale as one byte of them
+            scale = obstacle_type["scale"]
+            if not all(float(value).is_integer() for value in scale):
+                raise ValueError("obstacle type {} has a scale range of {}, scales have to be whole multiples "
+                                 "of SPRITE_SCALING".format(name, scale))
+            if not 1 <= scale[0] <= scale[1] <= MAX_SCALE:
+                raise ValueError("obstacle type {} has a scale range of {}, it has to go up from at least 1 "
+                                 "to at most {}".format(name, scale, MAX_SCALE))
+            self.scale_min[t], self.scale_max[t] = scale
+            self.direction_start[t] = len(vectors)
+            self.direction_count[t] = len(directions[direction_set])
+            vectors.extend(directions[direction_set])
+        self.directions = np.array(vectors, np.float64).reshape(-1, 2)
+
+        levels = definitions["levels"]
+        # everything about levels but the spawn tables, e.g. "time"
+        self.levels = {key: value for key, value in levels.items() if key != "spawn_tables"}
+
+        tables = sorted(levels["spawn_tables"], key=lambda table: table["from_level"])
+        if not tables:
+            raise ValueError("no spawn tables defined")
+        self.spawn_levels = np.array([table["from_level"] for table in tables], np.int64)
+        self.cumulative_weights = np.zeros((len(tables), len(types)))
+        for row, table in enumerate(tables):
+            weights = np.zeros(len(types))
+            for name, weight in table["weights"].items():
+                if name not in types:
+                    raise ValueError("spawn table from level {} has unknown obstacle type {}".format(
+                        table["from_level"], name))
+                weights[self.names.index(name)] = weight
+            if weights.sum() <= 0:
+                raise ValueError("spawn table from level {} has no weights".format(table["from_level"]))
+            self.cumulative_weights[row] = np.cumsum(weights) / weights.sum()
+
+    def spawn_types(self, level, amount, rng):
+        """
+        Type ids of amount obstacles spawned on level, drawn by the weights of its spawn table
+        """
+        row = max(int(np.searchsorted(self.spawn_levels, level, side="right")) - 1, 0)
+        index = np.searchsorted(self.cumulative_weights[row], rng.random(amount), side="right")
+        return self.type_ids[np.minimum(index, len(self.type_ids) - 1)]
+
+    def spawn_scales(self, types, rng):
+        """
+        Scale of every obstacle of types, in multiples of SPRITE_SCALING
+        """
+        return rng.integers(self.scale_min[types], self.scale_max[types] + 1)
+
+    def spawn_directions(self, types, rng):
+        """
+        A random (x, y) direction of its type's set for every obstacle of types
+        """
+        return self.directions[self.direction_start[types] + rng.integers(0, self.direction_count[types])]
+
+
+def load(path=DEFINITIONS_PATH):
+    with open(path) as f:
+        return ObstacleDefinitions(json.load(f))
+
+
+DEFINITIONS = load()
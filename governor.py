@@ -0,0 +1,84 @@
+"""
+Adaptive quality for machines that can't keep up.
+
+The governor is told how long the window took to update and draw every
+frame. When the slowest frames stay over the frame budget it turns on
+the next degradation in DEGRADATIONS, and when there is plenty of time
+left again it turns the last one off. Only what is there for the looks
+is degraded: the simulation runs the same on every machine, so replays
+and scores don't depend on it.
+"""
+
+import collections
+
+import numpy as np
+
+# turned on in this order and off in the reverse order
+DEGRADATIONS = (
+    # half the particles of every effect
+    "fewer_particles",
+    # no particle effects at all
+    "no_particles",
+    # the alpha of fading obstacles is only redrawn every few frames
+    "coarse_fades",
+    # update what is drawn at half the render rate, the simulation keeps its tick rate
+    "half_render_rate",
+)
+
+# share of the frame interval updating and drawing may take
+FRAME_BUDGET_SHARE = 0.8
+# frames measured before each decision
+GOVERNOR_WINDOW = 90
+# percentile of the frame costs compared to the budget
+GOVERNOR_PERCENTILE = 95
+# the last degradation is turned off again below this share of the budget
+RECOVERY_SHARE = 0.5
+
+
+class QualityGovernor:
+    """
+    Picks how many of the DEGRADATIONS are on from measured frame costs
+    """
+
+    def __init__(self, frame_interval, budget_share=FRAME_BUDGET_SHARE, window=GOVERNOR_WINDOW):
+        # seconds a frame may take
+        self.budget = frame_interval * budget_share
+        # seconds the last frames took, cleared after every decision
+        self.costs = collections.deque(maxlen=window)
+        # the first level degradations are on
+        self.level = 0
+
+    @property
+    def active(self):
+        """
+        Names of the degradations that are on
+        """
+        return DEGRADATIONS[:self.level]
+
+    def is_active(self, name):
+        return DEGRADATIONS.index(name) < self.level
+
+    def measure(self, seconds):
+        """
+        Add the cost of a frame, returns True when degradations were turned on or off
+        """
+        costs = self.costs
+        costs.append(seconds)
+        if len(costs) < costs.maxlen:
+            return False
+
+        cost = np.percentile(np.array(costs), GOVERNOR_PERCENTILE)
+        costs.clear()
+        if cost > self.budget and self.level < len(DEGRADATIONS):
+            self.level += 1
+            return True
+        if cost < self.budget * RECOVERY_SHARE and self.level > 0:
+            self.level -= 1
+            return True
+        return False
+
+    def report(self):
+        """
+        The active degradations as one line of text
+        """
+        return "quality: {}".format(", ".join(self.active) if self.level else "full")
@@ -0,0 +1,53 @@
+"""
+Retained text for the HUD and the menu screens.
+
+Labels keep their layout between frames and are only laid out again when
+the value they show changes. All labels of a Hud are drawn in one batch.
+"""
+
+import arcade
+import pyglet
+
+FONT_NAME = ("calibri", "arial")
+
+
+class Hud:
+    """
+    A group of text labels drawn together
+    """
+
+    def __init__(self):
+        self.batch = pyglet.graphics.Batch()
+        self.labels = {}
+        self.formats = {}
+        self.values = {}
+
+    def add(self, name, text_format, start_x, start_y, color=arcade.color.WHITE, font_size=12, value=None):
+        """
+        Add a label showing text_format.format(value)
+        """
+        self.labels[name] = pyglet.text.Label(
+            text=text_format.format(value),
+            x=start_x,
+            y=start_y,
+            font_name=FONT_NAME,
+            font_size=font_size,
+            color=arcade.get_four_byte_color(color),
+            batch=self.batch,
+        )
+        self.formats[name] = text_format
+        self.values[name] = value
+
+    def set(self, name, value):
+        """
+        Change the value a label shows, cheap when it is the same as before
+        """
+        if self.values[name] == value:
+            return
+        self.values[name] = value
+        self.labels[name].text = self.formats[name].format(value)
+
+    def draw(self):
+        # raw pyglet drawing needs this context helper inside arcade
+        with arcade.get_window().ctx.pyglet_rendering():
+            self.batch.draw()
@@ -0,0 +1,782 @@
+"""
+Several players dodging the same obstacles, over the network.
+
+The server runs one Simulation per player. The first one owns the
+obstacles and the others share them through SharedObstacles, so all
+players dodge the same field while keeping their own lives, dashes,
+power-ups and score. Clients send their inputs and get back snapshots
+of the obstacles and players, which they interpolate between.
+
+Snapshots are quantised to a few bytes per obstacle and delta
+compressed against the last snapshot the client acknowledged: only
+obstacles that moved are sent, as small differences, plus the ones
+that appeared and the ids of the ones that are gone. The result is
+compressed with zlib. Acknowledged baselines make this work over UDP,
+where snapshots get lost, as well as over TCP.
+
+    python multiplayer.py loopback --players 4 --transport udp
+
+runs a server and bot clients over loopback and reports the bytes sent
+per tick and the latency. The server and clients can also run apart:
+
+    python multiplayer.py server --players 2 --port 7777
+    python multiplayer.py client --host 127.0.0.1 --port 7777
+
+"""
+
+import argparse
+import asyncio
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from definitions import DEFINITIONS
+from simulation import (
+    POWERUP_KINDS,
+    SIMULATION_RATE,
+    SIMULATION_STEP,
+    SPRITE_SCALING,
+    Inputs,
+    RandomBot,
+    Simulation,
+    image_size,
+    new_seed,
+)
+
+TRANSPORTS = ("tcp", "udp")
+PORT = 7777
+
+# ticks between snapshots, 60 per second
+SNAPSHOT_INTERVAL = 2
+# snapshots the server keeps as baselines for clients that are behind
+BASELINE_HISTORY = 64
+# largest snapshot sent over UDP, bigger ones are skipped
+MAX_DATAGRAM = 65507
+
+# positions are sent in 1/POSITION_SCALE pixels, angles in 1/256 of a turn
+POSITION_SCALE = 8
+ANGLE_SCALE = 256 / 360
+
+OBSTACLE_RECORD = np.dtype([
+    ("id", "<u4"),
+    ("x", "<i2"),
+    ("y", "<i2"),
+    ("angle", "u1"),
+    ("alpha", "u1"),
+    ("type", "u1"),
+    # multiple of SPRITE_SCALING
+    ("scale", "u1"),
+])
+
+PLAYER_RECORD = np.dtype([
+    ("x", "<i2"),
+    ("y", "<i2"),
+    ("angle", "u1"),
+    ("flags", "u1"),
+    ("lives", "<i4"),
+    ("score", "<u4"),
+])
+# bits of PLAYER_RECORD flags
+IS_DASHING = 1
+IS_TAKING_DAMAGE = 2
+CAN_DASH = 4
+GAME_OVER = 8
+
+POWERUP_RECORD = np.dtype([
+    ("kind", "u1"),
+    ("x", "<i2"),
+    ("y", "<i2"),
+    ("alpha", "u1"),
+])
+
+# obstacles that moved: dx, dy, angle and alpha difference
+DELTA_RECORD = np.dtype([("x", "i1"), ("y", "i1"), ("angle", "i1"), ("alpha", "i1")])
+
+# tick, baseline tick or -1, echoed client time, your player index, level, seconds left in the level,
+# players, power-ups, removed, changed and added obstacles
+SNAPSHOT_HEADER = struct.Struct("<IidBHfBBIII")
+# acknowledged tick or -1, client time, held buttons, dashes so far
+INPUT_MESSAGE = struct.Struct("<idBB")
+# bits of the held buttons
+LEFT, RIGHT, UP, DOWN = 1, 2, 4, 8
+
+# length prefix of messages over TCP
+FRAME = struct.Struct("<I")
+
+
+class SharedObstacles:
+    """
+    The obstacles of another Simulation, for the players that don't own them.
+
+    Only the owner clears, spawns and moves them, this just lets a
+    Simulation collide with them.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store)
+
+    @property
+    def is_harmless(self):
+        return self.store.is_harmless
+
+    @property
+    def center_x(self):
+        return self.store.center_x
+
+    @property
+    def center_y(self):
+        return self.store.center_y
+
+    def clear(self):
+        pass
+
+    def spawn(self, amount, spawn_on_edge=False, level=1):
+        return 0, 0
+
+    def prepare(self, amount, rng, level=1):
+        return None
+
+    def spawn_layout(self, layout):
+        return 0, 0
+
+    def end_harmless(self, first_id, end_id):
+        pass
+
+    def on_update(self, delta_time):
+        pass
+
+    def colliding(self, x, y, radius):
+        return self.store.colliding(x, y, radius)
+
+    def colliding_swept(self, x0, y0, x1, y1, radius):
+        return self.store.colliding_swept(x0, y0, x1, y1, radius)
+
+
+def quantise_position(values):
+    return np.clip(np.round(np.asarray(values) * POSITION_SCALE), -32768, 32767)
+
+
+def quantise_angle(values):
+    return np.round(np.asarray(values) * ANGLE_SCALE).astype(np.int64) & 255
+
+
+def quantise_obstacles(store):
+    """
+    The obstacles of an ObstacleStore as OBSTACLE_RECORD rows, sorted by id
+    """
+    n = len(store)
+    order = np.argsort(store.ids[:n], kind="stable")
+    rows = np.empty(n, OBSTACLE_RECORD)
+    rows["id"] = store.ids[:n][order]
+    rows["x"] = quantise_position(store.center_x[:n][order])
+    rows["y"] = quantise_position(store.center_y[:n][order])
+    rows["angle"] = quantise_angle(store.angle[:n][order])
+    rows["alpha"] = np.clip(np.round(store.alpha[:n][order]), 0, 255)
+    rows["type"] = store.type[:n][order]
+    rows["scale"] = np.round(store.scale[:n][order] / SPRITE_SCALING)
+    return rows
+
+
+def quantise_players(simulations):
+    rows = np.zeros(len(simulations), PLAYER_RECORD)
+    for row, simulation in zip(rows, simulations):
+        player = simulation.player
+        row["x"] = quantise_position(player.center_x)
+        row["y"] = quantise_position(player.center_y)
+        row["angle"] = quantise_angle(player.angle)
+        row["flags"] = (
+            IS_DASHING * player.is_dashing | IS_TAKING_DAMAGE * player.is_taking_damage |
+            CAN_DASH * player.can_dash | GAME_OVER * simulation.game_over)
+        row["lives"] = max(player.player_lives, 0)
+        row["score"] = int(player.player_score) * 10
+    return rows
+
+
+def quantise_powerups(simulation):
+    rows = np.zeros(len(simulation.powerups), POWERUP_RECORD)
+    for row, powerup in zip(rows, simulation.powerups):
+        row["kind"] = POWERUP_KINDS.index(powerup.kind)
+        row["x"] = quantise_position(powerup.center_x)
+        row["y"] = quantise_position(powerup.center_y)
+        row["alpha"] = round(powerup.alpha)
+    return rows
+
+
+def encode_obstacles(current, baseline):
+    """
+    Delta of two OBSTACLE_RECORD arrays sorted by id, as (removed ids, changed bitmask, deltas, added rows)
+    """
+    if baseline is None:
+        return np.zeros(0, "<u4"), np.zeros(0, np.uint8), np.zeros(0, DELTA_RECORD), current
+
+    in_current = np.isin(baseline["id"], current["id"], assume_unique=True)
+    in_baseline = np.isin(current["id"], baseline["id"], assume_unique=True)
+    # both sorted by id, so the kept rows line up
+    old = baseline[in_current]
+    new = current[in_baseline]
+
+    dx = new["x"].astype(np.int32) - old["x"]
+    dy = new["y"].astype(np.int32) - old["y"]
+    # angles wrap around, any difference fits a signed byte
+    dangle = ((new["angle"].astype(np.int32) - old["angle"] + 128) & 255) - 128
+    dalpha = new["alpha"].astype(np.int32) - old["alpha"]
+
+    # rows that moved too far for a byte are sent again in full
+    fits = (np.abs(dx) < 128) & (np.abs(dy) < 128) & (np.abs(dalpha) < 128)
+    removed = np.concatenate((baseline["id"][~in_current], old["id"][~fits])).astype("<u4")
+    added = np.concatenate((current[~in_baseline], new[~fits]))
+
+    dx, dy, dangle, dalpha = dx[fits], dy[fits], dangle[fits], dalpha[fits]
+    changed = (dx != 0) | (dy != 0) | (dangle != 0) | (dalpha != 0)
+    deltas = np.zeros(np.count_nonzero(changed), DELTA_RECORD)
+    deltas["x"] = dx[changed]
+    deltas["y"] = dy[changed]
+    deltas["angle"] = dangle[changed]
+    deltas["alpha"] = dalpha[changed]
+    return removed, np.packbits(changed), deltas, added
+
+
+def decode_obstacles(baseline, removed, changed, deltas, added):
+    """
+    The OBSTACLE_RECORD rows encode_obstacles was given as current
+    """
+    if baseline is None:
+        rows = added.copy()
+    else:
+        kept = baseline[~np.isin(baseline["id"], removed, assume_unique=True)].copy()
+        changed = np.unpackbits(changed, count=len(kept)).astype(np.bool_)
+        moved = kept[changed]
+        moved["x"] = moved["x"] + deltas["x"]
+        moved["y"] = moved["y"] + deltas["y"]
+        moved["angle"] = (moved["angle"].astype(np.int32) + deltas["angle"]) & 255
+        moved["alpha"] = moved["alpha"] + deltas["alpha"]
+        kept[changed] = moved
+        rows = np.concatenate((kept, added))
+    rows.sort(order="id", kind="stable")
+    return rows
+
+
+class Peer:
+    """
+    A connected client, as the server sees it
+    """
+
+    def __init__(self, index, send):
+        self.index = index
+        # called with the bytes of a message
+        self.send = send
+        self.acked_tick = -1
+        self.echo_time = 0.0
+        self.dashes = 0
+        # False once the client went away, nothing more is sent to it
+        self.connected = True
+        self.bytes_sent = 0
+        # bytes the same snapshots would take without delta compression
+        self.full_bytes = 0
+        self.snapshots_sent = 0
+
+
+class GameServer:
+    """
+    Runs the game for num_players players and sends them snapshots
+    """
+
+    def __init__(self, num_players, seed=None, obstacles=None, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.num_players = num_players
+        self.seed = seed if seed is not None else new_seed()
+        self.snapshot_interval = snapshot_interval
+
+        host = Simulation(self.seed, obstacle_amount=obstacles)
+        self.simulations = [host] + [
+            Simulation((self.seed + i) % 2 ** 63, lambda rng: SharedObstacles(host.obstacles))
+            for i in range(1, num_players)
+        ]
+        self.inputs = [Inputs() for i in range(num_players)]
+
+        # peers by connection, see add_peer
+        self.peers = {}
+        # quantised obstacles by tick, the baselines of the deltas
+        self.history = {}
+        self.tick = 0
+        # seconds each tick took to simulate
+        self.tick_times = []
+
+    @property
+    def full(self):
+        return len(self.peers) == self.num_players
+
+    @property
+    def game_over(self):
+        return all(simulation.game_over for simulation in self.simulations)
+
+    def add_peer(self, connection, send):
+        """
+        Give a new connection the next free player, returns None if the game is full
+        """
+        peer = self.peers.get(connection)
+        if peer is None and not self.full:
+            peer = self.peers[connection] = Peer(len(self.peers), send)
+        return peer
+
+    def receive(self, peer, data):
+        """
+        Apply an INPUT_MESSAGE from a peer
+        """
+        acked_tick, client_time, buttons, dashes = INPUT_MESSAGE.unpack(data)
+        # messages can arrive out of order over UDP
+        if acked_tick > peer.acked_tick:
+            peer.acked_tick = acked_tick
+        peer.echo_time = max(peer.echo_time, client_time)
+
+        inputs = self.inputs[peer.index]
+        inputs.left = bool(buttons & LEFT)
+        inputs.right = bool(buttons & RIGHT)
+        inputs.up = bool(buttons & UP)
+        inputs.down = bool(buttons & DOWN)
+        # dashes are counted, so a lost message doesn't lose a dash
+        if dashes != peer.dashes:
+            peer.dashes = dashes
+            inputs.dash = True
+
+    def step(self):
+        """
+        Advance every player's game by one tick, all on the same obstacles
+        """
+        start = time.perf_counter()
+        host = self.simulations[0]
+        # the host always runs, its simulation moves the obstacles and starts the levels.
+        # Once it is out of lives that is all it does, see Simulation.begin_step
+        running = [
+            (simulation, inputs) for i, (simulation, inputs) in enumerate(zip(self.simulations, self.inputs))
+            if i == 0 or not simulation.game_over
+        ]
+        for simulation, inputs in running:
+            simulation.begin_step(SIMULATION_STEP, inputs)
+        host.obstacles.on_update(SIMULATION_STEP)
+        for simulation, inputs in running:
+            simulation.finish_step(SIMULATION_STEP)
+            inputs.dash = False
+        self.tick += 1
+        self.tick_times.append(time.perf_counter() - start)
+
+        if self.tick % self.snapshot_interval == 0:
+            self.send_snapshots()
+
+    def send_snapshots(self):
+        host = self.simulations[0]
+        obstacles = quantise_obstacles(host.obstacles)
+        self.history[self.tick] = obstacles
+        self.history.pop(self.tick - BASELINE_HISTORY * self.snapshot_interval, None)
+        players = quantise_players(self.simulations)
+
+        full_bytes = SNAPSHOT_HEADER.size + players.nbytes + obstacles.nbytes
+        for peer in self.peers.values():
+            if not peer.connected:
+                continue
+            baseline = self.history.get(peer.acked_tick)
+            removed, changed, deltas, added = encode_obstacles(obstacles, baseline)
+            powerups = quantise_powerups(self.simulations[peer.index])
+            header = SNAPSHOT_HEADER.pack(
+                self.tick, peer.acked_tick if baseline is not None else -1, peer.echo_time, peer.index,
+                host.current_level, host.level_time_left, len(players), len(powerups),
+                len(removed), len(deltas), len(added))
+            body = zlib.compress(b"".join((
+                players.tobytes(), powerups.tobytes(), removed.tobytes(), changed.tobytes(), deltas.tobytes(),
+                added.tobytes(),
+            )), 1)
+            peer.bytes_sent += len(header) + len(body)
+            peer.full_bytes += full_bytes + powerups.nbytes
+            peer.snapshots_sent += 1
+            peer.send(header + body)
+
+    def report(self):
+        """
+        Bytes sent per tick to every client and the cost of a tick, as text
+        """
+        lines = []
+        for peer in sorted(self.peers.values(), key=lambda peer: peer.index):
+            lines.append("player {}: {:.1f} bytes per tick, {:.1f} per snapshot, {:.1%} of full snapshots".format(
+                peer.index, peer.bytes_sent / max(self.tick, 1), peer.bytes_sent / max(peer.snapshots_sent, 1),
+                peer.bytes_sent / max(peer.full_bytes, 1)))
+        if self.tick_times:
+            lines.append("tick: {:.3f} ms p50, {:.3f} ms p99".format(
+                *(np.percentile(self.tick_times, (50, 99)) * 1000)))
+        return "\n".join(lines)
+
+    async def run(self):
+        """
+        Wait for all players, then simulate SIMULATION_RATE ticks per second until everyone lost
+        """
+        while not self.full:
+            await asyncio.sleep(0.01)
+
+        loop = asyncio.get_running_loop()
+        due = loop.time()
+        while not self.game_over:
+            self.step()
+            due += SIMULATION_STEP
+            await asyncio.sleep(max(0, due - loop.time()))
+
+
+class GameClient:
+    """
+    One player's view of the game, built from the server's snapshots
+    """
+
+    def __init__(self, bot=None):
+        # plays for the client if given, called with the client like with a Simulation
+        self.bot = bot
+        self.send = None
+
+        self.tick = -1
+        self.player_index = None
+        self.current_level = 0
+        self.level_time_left = 0
+        self.players = np.zeros(0, PLAYER_RECORD)
+        self.powerups = np.zeros(0, POWERUP_RECORD)
+        # the last two snapshots' obstacles and players, interpolated between
+        self.obstacles = np.zeros(0, OBSTACLE_RECORD)
+        self.previous_obstacles = self.obstacles
+        self.previous_players = self.players
+        # when the last snapshot arrived and the server time between the last two
+        self.received_at = 0
+        self.interval = SNAPSHOT_INTERVAL * SIMULATION_STEP
+
+        # decoded obstacles by tick, baselines of the next deltas
+        self.history = {}
+        self.dashes = 0
+
+        self.bytes_received = 0
+        self.snapshots = 0
+        # seconds from sending inputs to getting a snapshot made after they arrived
+        self.latencies = []
+
+        # size of every obstacle type, to draw the records
+        size = len(DEFINITIONS.type_ids) + 1
+        self.type_width = np.zeros(size)
+        self.type_height = np.zeros(size)
+        for t, graphics in DEFINITIONS.graphics.items():
+            self.type_width[t], self.type_height[t] = image_size(graphics)
+
+    @property
+    def game_over(self):
+        return self.player_index is not None and bool(self.players["flags"][self.player_index] & GAME_OVER)
+
+    def receive(self, data):
+        """
+        Apply a snapshot from the server
+        """
+        now = time.perf_counter()
+        (tick, baseline_tick, echo_time, player_index, level, level_time_left,
+         player_count, powerup_count, removed_count, changed_count, added_count) = SNAPSHOT_HEADER.unpack_from(data)
+        if tick <= self.tick:
+            # late over UDP, a newer one already arrived
+            return
+        baseline = None
+        if baseline_tick >= 0:
+            baseline = self.history.get(baseline_tick)
+            if baseline is None:
+                return
+
+        body = zlib.decompress(data[SNAPSHOT_HEADER.size:])
+        offset = 0
+        arrays = []
+        for dtype, count in (
+                (PLAYER_RECORD, player_count), (POWERUP_RECORD, powerup_count), (np.dtype("<u4"), removed_count)):
+            arrays.append(np.frombuffer(body, dtype, count, offset))
+            offset += dtype.itemsize * count
+        players, powerups, removed = arrays
+        kept = len(baseline) - removed_count if baseline is not None else 0
+        changed = np.frombuffer(body, np.uint8, (kept + 7) // 8, offset)
+        offset += changed.nbytes
+        deltas = np.frombuffer(body, DELTA_RECORD, changed_count, offset)
+        offset += deltas.nbytes
+        added = np.frombuffer(body, OBSTACLE_RECORD, added_count, offset)
+
+        obstacles = decode_obstacles(baseline, removed, changed, deltas, added)
+        self.history[tick] = obstacles
+        for old_tick in [t for t in self.history if t < tick - BASELINE_HISTORY * SNAPSHOT_INTERVAL]:
+            del self.history[old_tick]
+
+        if self.tick >= 0:
+            # snapshots lost over UDP make the gap longer
+            self.interval = (tick - self.tick) * SIMULATION_STEP
+        self.tick = tick
+        self.player_index = player_index
+        self.current_level = level
+        self.level_time_left = level_time_left
+        self.previous_obstacles = self.obstacles
+        self.obstacles = obstacles
+        self.previous_players = self.players if len(self.players) == len(players) else players
+        self.players = players
+        self.powerups = powerups
+        self.received_at = now
+
+        self.bytes_received += len(data)
+        self.snapshots += 1
+        if echo_time > 0:
+            self.latencies.append(now - echo_time)
+
+    def input_message(self, inputs):
+        """
+        INPUT_MESSAGE for inputs, acknowledging the last snapshot
+        """
+        if inputs.dash:
+            self.dashes = (self.dashes + 1) & 255
+        buttons = LEFT * inputs.left | RIGHT * inputs.right | UP * inputs.up | DOWN * inputs.down
+        return INPUT_MESSAGE.pack(self.tick, time.perf_counter(), buttons, self.dashes)
+
+    def alpha(self, now=None):
+        """
+        How far to draw between the last two snapshots, the time since the last one arrived over the time between them
+        """
+        now = now if now is not None else time.perf_counter()
+        return min(max((now - self.received_at) / self.interval, 0), 1)
+
+    def interpolated_obstacles(self, alpha):
+        """
+        (ids, types, x, y, angle, alpha, width, height) of the obstacles, alpha of the way
+        from the previous snapshot to the last one, as ObstacleSpriteList.show takes them
+        """
+        rows = self.obstacles
+        previous = self.previous_obstacles
+        x = rows["x"] / POSITION_SCALE
+        y = rows["y"] / POSITION_SCALE
+        angle = rows["angle"] / ANGLE_SCALE
+
+        # obstacles new in the last snapshot are drawn where they are
+        if len(previous):
+            index = np.minimum(np.searchsorted(previous["id"], rows["id"]), len(previous) - 1)
+            known = previous["id"][index] == rows["id"]
+            old = previous[index[known]]
+            x[known] = old["x"] / POSITION_SCALE + (x[known] - old["x"] / POSITION_SCALE) * alpha
+            y[known] = old["y"] / POSITION_SCALE + (y[known] - old["y"] / POSITION_SCALE) * alpha
+            # the short way round, angles wrap at 256
+            turn = ((rows["angle"][known].astype(np.int32) - old["angle"] + 128) & 255) - 128
+            angle[known] = (old["angle"] + turn * alpha) / ANGLE_SCALE
+
+        scale = rows["scale"] * SPRITE_SCALING
+        return (
+            rows["id"], rows["type"], x, y, angle, rows["alpha"],
+            self.type_width[rows["type"]] * scale, self.type_height[rows["type"]] * scale,
+        )
+
+    def interpolated_players(self, alpha):
+        """
+        (x, y) of every player, alpha of the way from the previous snapshot to the last one
+        """
+        previous = self.previous_players
+        x = (previous["x"] + (self.players["x"] - previous["x"].astype(np.float64)) * alpha) / POSITION_SCALE
+        y = (previous["y"] + (self.players["y"] - previous["y"].astype(np.float64)) * alpha) / POSITION_SCALE
+        return x, y
+
+    def report(self):
+        """
+        Bytes received per tick and the latency, as text
+        """
+        lines = ["player {}: {} snapshots, {:.1f} bytes per tick".format(
+            self.player_index, self.snapshots, self.bytes_received / max(self.tick, 1))]
+        if self.latencies:
+            p50, p95 = np.percentile(self.latencies, (50, 95)) * 1000
+            lines.append("  latency {:.2f} ms p50, {:.2f} ms p95, {:.1f} ticks p50".format(
+                p50, p95, p50 / 1000 * SIMULATION_RATE))
+        return "\n".join(lines)
+
+    async def run(self):
+        """
+        Send the bot's inputs once per snapshot interval until the game is over
+        """
+        inputs = Inputs()
+        while not self.game_over:
+            if self.bot is not None:
+                inputs = self.bot(self)
+            if self.send is not None:
+                self.send(self.input_message(inputs))
+            await asyncio.sleep(SNAPSHOT_INTERVAL * SIMULATION_STEP)
+
+
+class TcpServerConnection:
+    """
+    Feeds the messages of one TCP client to the server
+    """
+
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+
+    def send(self, data):
+        self.writer.write(FRAME.pack(len(data)) + data)
+
+    async def run(self):
+        try:
+            while True:
+                length, = FRAME.unpack(await self.reader.readexactly(FRAME.size))
+                data = await self.reader.readexactly(length)
+                peer = self.server.add_peer(self, self.send)
+                if peer is None:
+                    break
+                self.server.receive(peer, data)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            peer = self.server.peers.get(self)
+            if peer is not None:
+                peer.connected = False
+            self.writer.close()
+
+
+class UdpServerProtocol(asyncio.DatagramProtocol):
+    """
+    Feeds datagrams to the server, clients are told apart by their address
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, address):
+        def send(data):
+            if len(data) <= MAX_DATAGRAM:
+                self.transport.sendto(data, address)
+
+        peer = self.server.add_peer(address, send)
+        if peer is not None:
+            self.server.receive(peer, data)
+
+
+class UdpClientProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, client):
+        self.client = client
+
+    def datagram_received(self, data, address):
+        self.client.receive(data)
+
+
+async def serve(server, transport, host, port):
+    """
+    Accept clients over transport and run the server until the game is over
+    """
+    if transport == "tcp":
+        async def accept(reader, writer):
+            await TcpServerConnection(server, reader, writer).run()
+
+        listener = await asyncio.start_server(accept, host, port)
+        try:
+            await server.run()
+        finally:
+            listener.close()
+    else:
+        datagrams, protocol = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: UdpServerProtocol(server), local_addr=(host, port))
+        try:
+            await server.run()
+        finally:
+            datagrams.close()
+
+
+async def connect(client, transport, host, port):
+    """
+    Connect client to a server over transport and play until its game is over
+    """
+    if transport == "tcp":
+        reader, writer = await asyncio.open_connection(host, port)
+        client.send = lambda data: writer.write(FRAME.pack(len(data)) + data)
+
+        async def read():
+            try:
+                while True:
+                    length, = FRAME.unpack(await reader.readexactly(FRAME.size))
+                    client.receive(await reader.readexactly(length))
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+
+        reading = asyncio.ensure_future(read())
+        try:
+            await client.run()
+        finally:
+            reading.cancel()
+            writer.close()
+    else:
+        datagrams, protocol = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: UdpClientProtocol(client), remote_addr=(host, port))
+        client.send = datagrams.sendto
+        try:
+            await client.run()
+        finally:
+            datagrams.close()
+
+
+async def loopback(num_players, transport, port, seed=None, obstacles=None, ticks=None):
+    """
+    A server and num_players bot clients in one process, returns them when done
+    """
+    server = GameServer(num_players, seed, obstacles)
+    clients = [GameClient(RandomBot(seed=i)) for i in range(num_players)]
+    serving = asyncio.ensure_future(serve(server, transport, "127.0.0.1", port))
+    # give the server a moment to listen
+    await asyncio.sleep(0.1)
+    playing = [asyncio.ensure_future(connect(client, transport, "127.0.0.1", port)) for client in clients]
+
+    if ticks is None:
+        await serving
+    else:
+        while server.tick < ticks and not server.game_over:
+            await asyncio.sleep(0.1)
+        serving.cancel()
+    for task in playing:
+        task.cancel()
+    await asyncio.gather(serving, *playing, return_exceptions=True)
+    return server, clients
+
+
+def main():
+    """
+    Main method
+    """
+    parser = argparse.ArgumentParser(description="Play the game with several players over the network")
+    parser.add_argument("mode", choices=("loopback", "server", "client"),
+                        help="run a server with bot clients, only a server, or only a bot client")
+    parser.add_argument("--players", type=int, default=2, help="players in the game")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="tcp")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--obstacles", type=int, default=None, help="obstacles in the first level")
+    parser.add_argument("--ticks", type=int, default=None, help="stop after this many ticks")
+    args = parser.parse_args()
+
+    if args.mode == "loopback":
+        server, clients = asyncio.run(
+            loopback(args.players, args.transport, args.port, args.seed, args.obstacles, args.ticks))
+        print("{} ticks over {}".format(server.tick, args.transport))
+        print(server.report())
+        for client in clients:
+            print(client.report())
+    elif args.mode == "server":
+        server = GameServer(args.players, args.seed, args.obstacles)
+        try:
+            asyncio.run(serve(server, args.transport, args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        print(server.report())
+    else:
+        client = GameClient(RandomBot())
+        try:
+            asyncio.run(connect(client, args.transport, args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        print(client.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -7,47 +7,61 @@ Artwork from https://kenney.nl/assets/space-shooter-redux
 
 """
 
+import argparse
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import arcade
-import random
-
-SPRITE_SCALING = 0.3
-
-# Set the size of the screen
-SCREEN_WIDTH = 1000
-SCREEN_HEIGHT = 800
-
-# Variables controlling the player
-PLAYER_LIVES = 5
-PLAYER_SPEED_X = 10
-PLAYER_SPEED_Y = 10
-PLAYER_START_X = SCREEN_WIDTH / 2
-PLAYER_START_Y = SCREEN_HEIGHT / 2
-PLAYER_SHOT_SPEED = 4
-OBSTACLE_SPEED = 16
-OBSTACLE_AMOUNT = 50
-DASHING_TIME = 0.3
-DASH_COOLDOWN = 1
-OBSTACLE_HARMLESS_TIME = 2.2
-OBSTACLE_HARMLESS_ALPHA = 100
-OBSTACLE_HARMLESS_SPEED_FACTOR = 0.3
-# length of a level in seconds
-LEVEL_TIME = 15
-
-TAKING_DAMAGE_TIME = 0.75
-LIVES_TAKING_DAMAGE = 1
-DASH_ALPHA = 100
-
-POWERUP_ALIVE_TIME = 5
+import numpy as np
+import pyglet
+
+from assets import (
+    AssetRegistry, PLAYER_DAMAGE_GRAPHICS, POWERUP_EXTRA_LIFE_GRAPHICS, POWERUP_EXTRA_SCORE_GRAPHICS, PICK_UP_SOUND,
+    DASH_SOUND
+)
+from controls import DASH, DOWN, LEFT, RIGHT, UP, InputBuffer, InputState
+from definitions import DEFINITIONS
+from governor import QualityGovernor
+from hud import Hud
+from multiplayer import ANGLE_SCALE, GAME_OVER, IS_DASHING, IS_TAKING_DAMAGE, PORT, TRANSPORTS, GameClient, connect
+from particles import ParticleSystem
+from profiler import NullProfiler, Profiler
+from replay import ReplayRecorder
+from simulation import (
+    SCREEN_WIDTH, SCREEN_HEIGHT, SPRITE_SCALING, PLAYER_SHOT_SPEED, PLAYER_GRAPHICS,
+    POWERUP_GRAPHICS, POWERUP_SCALING, SIMULATION_STEP, DASH_ALPHA, PowerUpState, Simulation
+)
+from simulation_thread import FrameState, SimulationThread, tick_events
 
 DASHING_KEY = arcade.key.SPACE
+# keys moving the player, and what they are in controls.py
+MOVEMENT_KEYS = {
+    arcade.key.LEFT: LEFT,
+    arcade.key.RIGHT: RIGHT,
+    arcade.key.UP: UP,
+    arcade.key.DOWN: DOWN,
+}
+# shows and hides the profiler overlay
+PROFILER_KEY = arcade.key.F3
+
+# how often the screen is drawn by default, the game logic runs at SIMULATION_RATE
+RENDER_RATE = 60
+# most ticks simulated per update before the game slows down
+MAX_STEPS_PER_UPDATE = 10
+# frames between refreshes of the profiler overlay, laying out text every frame would skew the numbers
+PROFILER_OVERLAY_INTERVAL = 30
+# frames between redraws of the obstacle alphas while the coarse_fades degradation is on
+COARSE_FADE_INTERVAL = 4
 
 
 class Player(arcade.Sprite):
     """
-    The player
+    The player, drawn from a simulation.PlayerState
     """
 
-    def __init__(self, **kwargs):
+    def __init__(self, state, assets, **kwargs):
         """
         Setup new Player object
         """
@@ -58,206 +72,179 @@ class Player(arcade.Sprite):
         # Pass arguments to class arcade.Sprite
         super().__init__(**kwargs)
 
-        self.taking_damage_timer = 0
+        self.state = state
 
         self.texture_dict = {
-            "damage": arcade.load_texture("images/playerShip1_red.png"),
-            "normal": arcade.load_texture("images/playerShip1_blue.png")
+            "damage": assets.texture(PLAYER_DAMAGE_GRAPHICS),
+            "normal": assets.texture(PLAYER_GRAPHICS)
         }
 
         self.texture = self.texture_dict["normal"]
 
-        self.player_lives = PLAYER_LIVES
-
-        self.wanted_angle = 0
-
-        self.is_dashing = False
-        self.dashing_time_left = 0
-        self.dash_cooldown = 0
+        self.sync()
 
-        self.player_score = 0
-
-    def dash(self):
+    def sync(self, alpha=1):
         """
-        Enable Dashing
+        Copy the simulated state onto the sprite, alpha of the way from the previous tick
         """
-        if not self.is_dashing and self.dash_cooldown <= 0:
-            self.is_dashing = True
-            self.dashing_time_left = DASHING_TIME
-            self.dash_cooldown = DASH_COOLDOWN
-            self.alpha = DASH_ALPHA
+        state = self.state
+        self.center_x, self.center_y, self.angle = state.interpolated(alpha)
+        self.alpha = state.alpha
+        texture = self.texture_dict["damage" if state.is_taking_damage else "normal"]
+        if self.texture is not texture:
+            self.texture = texture
 
-    def taking_damage(self):
-        if self.taking_damage_timer == 0:
-            self.taking_damage_timer = TAKING_DAMAGE_TIME
-            self.texture = self.texture_dict["damage"]
-            self.player_lives -= LIVES_TAKING_DAMAGE
 
-    def update(self, delta_time):
-        """
-        Move the sprite
-        """
-        if self.is_dashing:
-            self.dashing_time_left -= delta_time
-            if self.dashing_time_left <= 0:
-                self.is_dashing = False
-                self.dashing_time_left = 0
-                self.alpha = 255
-
-        if self.taking_damage_timer > 0:
-            self.taking_damage_timer -= delta_time
-        elif self.taking_damage_timer <= 0:
-            self.texture = self.texture_dict["normal"]
-            self.taking_damage_timer = 0
-
-        d = self.angle - self.wanted_angle
-        self.angle -= d / 10
-        # if self.wanted_angle < 0:
-        #    if self.angle > self.wanted_angle:
-        #        self.angle -= delta_time
-        # else:
-        #    if self.angle < self.wanted_angle:
-        #        self.angle += delta_time
-
-        # Update center_x
-        if self.is_dashing:
-            self.center_x += self.change_x * 3
-            self.center_y += self.change_y * 3
-        else:
-            self.center_x += self.change_x
-            self.center_y += self.change_y
+class BufferSpriteList(arcade.SpriteList):
+    """
+    A sprite list whose buffers are written with NumPy, all sprites at once.
 
-        # Don't let the player move off-screen
-        if self.left < 0:
-            self.left = 0
-        elif self.right > SCREEN_WIDTH - 1:
-            self.right = SCREEN_WIDTH - 1
-        elif self.top > SCREEN_HEIGHT - 1:
-            self.top = SCREEN_HEIGHT - 1
-        elif self.bottom < 0:
-            self.bottom = 0
+    The sprites in the list only hold slots in its buffers. Positions,
+    angles, alphas, sizes and textures are written into the buffers in
+    bulk instead of sprite by sprite and attribute by attribute, so each
+    buffer is uploaded once per frame. Sprites fully off-screen are left
+    out of the index buffer and not drawn at all.
+    """
 
-        if not self.is_dashing:
-            self.dash_cooldown -= delta_time
+    def __init__(self, atlas):
 
-        self.player_score += int((10 * delta_time) * 10)
+        super().__init__(atlas=atlas)
 
+        # buffer slot of sprite i
+        self.slots = np.zeros(0, np.int64)
 
-class Obstacle(arcade.Sprite):
+    def texture_slots(self, textures):
+        """
+        Atlas slots of textures, as written into the texture buffer
+        """
+        self._init_deferred()
+        return np.array([self.atlas.add(texture)[0] for texture in textures], np.float32)
+
+    def write(self, center_x, center_y, angle, alpha, width, height, texture=None):
+        """
+        Show len(center_x) sprites.
+
+        Alphas are only written when alpha isn't None, sizes and textures
+        only when texture isn't None.
+        """
+        n = len(center_x)
+        if len(self.sprite_list) < n:
+            # append expects the index buffer to hold every sprite
+            self._sprite_index_slots = len(self.sprite_list)
+            for i in range(n - len(self.sprite_list)):
+                self.append(arcade.Sprite())
+            self.slots = np.array([self.sprite_slot[sprite] for sprite in self.sprite_list], np.int64)
+        slots = self.slots[:n]
+
+        # views of the buffers, made after appending as that may grow them
+        position = np.frombuffer(self._sprite_pos_data, np.float32).reshape(-1, 2)
+        angles = np.frombuffer(self._sprite_angle_data, np.float32)
+        color = np.frombuffer(self._sprite_color_data, np.uint8).reshape(-1, 4)
+        index = np.frombuffer(self._sprite_index_data, np.dtype(self._sprite_index_data.typecode))
+
+        position[slots, 0] = center_x
+        position[slots, 1] = center_y
+        angles[slots] = angle
+        self._sprite_pos_changed = True
+        self._sprite_angle_changed = True
+
+        if alpha is not None:
+            color[slots, :3] = 255
+            color[slots, 3] = alpha
+            self._sprite_color_changed = True
+
+        if texture is not None:
+            size = np.frombuffer(self._sprite_size_data, np.float32).reshape(-1, 2)
+            size[slots, 0] = width
+            size[slots, 1] = height
+            np.frombuffer(self._sprite_texture_data, np.float32)[slots] = texture
+            self._sprite_size_changed = True
+            self._sprite_texture_changed = True
+
+        # half the diagonal reaches the furthest corner whatever the angle
+        reach = np.hypot(width, height) / 2
+        visible = slots[
+            (center_x + reach > 0) & (center_x - reach < SCREEN_WIDTH)
+            & (center_y + reach > 0) & (center_y - reach < SCREEN_HEIGHT)
+        ]
+        index[:len(visible)] = visible
+        self._sprite_index_slots = len(visible)
+        self._sprite_index_changed = True
+
+    def draw(self, **kwargs):
+        if self._sprite_index_slots:
+            super().draw(**kwargs)
+
+
+class ObstacleSpriteList(BufferSpriteList):
     """
-    obstacles to dodge
+    Draws the obstacles of a simulation.ObstacleStore, sprite i shows obstacle slot i
     """
 
-    obstacle_max_speed = 2
-
-    types = {
-        1: {
-            "vectors": [
-                [1, 0],  # right
-                [-1, 0],  # left
-                [0, 1],  # up
-                [0, -1],  # down
-                [1, 1],
-                [-1, -1],
-                [1, -1],
-                [-1, 1]
-            ],
-            "graphics": "images/Meteors/meteorGrey_med2.png",
-            # "scaling": random.randint(3, 8)
-        },
-        2: {
-            "vectors": [
-                [1, 0],  # right
-                [-1, 0],  # left
-                [0, 1],  # up
-                [0, -1],  # down
-                [1, 1],
-                [-1, -1],
-                [1, -1],
-                [-1, 1]
-            ],
-            "graphics": "images/Meteors/meteorBrown_med3.png",
-            # "scaling": random.randint(4, 9)
-        },
-        3: {
-            "vectors": [
-                [1, 0],  # right
-                [-1, 0],  # left
-                [0, 1],  # up
-                [0, -1],  # down
-                [1, 1],
-                [-1, -1],
-                [1, -1],
-                [-1, 1]
-            ],
-            "graphics": "images/Meteors/meteorGrey_tiny2.png",
-            # "scaling": random.randint(4, 9),
-        }
-    }
+    def __init__(self, atlas, textures):
 
-    def __init__(self, speed, type=1, spawn_on_edge=False):
+        super().__init__(atlas)
 
-        super().__init__(Obstacle.types[type]["graphics"], SPRITE_SCALING * random.randint(5, 10))
+        # texture of every obstacle type
+        self.textures = textures
+        # atlas slot of every obstacle type's texture
+        self.type_texture_slots = None
+        # ids shown last frame, sizes and textures only change with them
+        self.shown_ids = np.zeros(0, np.int64)
+        # frames between redraws of the alphas
+        self.fade_interval = 1
+        self.frame = 0
 
-        if spawn_on_edge:
-            spawn_positions = [
-                (random.randint(0, SCREEN_WIDTH), SCREEN_HEIGHT),  # Top edge
-                (SCREEN_WIDTH, random.randint(0, SCREEN_HEIGHT)),  # Right
-                (0, random.randint(0, SCREEN_HEIGHT)),  # Left
-                (random.randint(0, SCREEN_WIDTH), 0)  #
-            ]
-            self.center_x, self.center_y = random.choice(spawn_positions)
-        else:
-            self.center_x = random.randint(0, SCREEN_WIDTH)
-            self.center_y = random.randint(0, SCREEN_HEIGHT)
+    def sync(self, obstacles, alpha):
+        """
+        Write the obstacles into the buffers, alpha of the way from the previous tick
+        """
+        n = len(obstacles)
+        center_x, center_y, angle = obstacles.interpolated(alpha)
+        self.show(obstacles.ids[:n], obstacles.type[:n], center_x, center_y, angle, obstacles.alpha[:n],
+                  obstacles.width[:n], obstacles.height[:n])
 
-        self.speed_x, self.speed_y = random.choice(Obstacle.types[type]["vectors"])
+    def show(self, ids, types, center_x, center_y, angle, alphas, width, height):
+        """
+        Write obstacles given as arrays into the buffers, e.g. from multiplayer.GameClient.interpolated_obstacles
+        """
+        if self.type_texture_slots is None:
+            known = list(self.textures)
+            self.type_texture_slots = np.zeros(max(known) + 1, np.float32)
+            self.type_texture_slots[known] = self.texture_slots([self.textures[type] for type in known])
 
-        # random speed noise for obstacles
-        self.speed_noise = random.uniform(0.6, 1.5)
-        self.change_x *= speed * self.speed_noise
-        self.change_y *= speed * self.speed_noise
+        texture = None
+        if not np.array_equal(ids, self.shown_ids):
+            texture = self.type_texture_slots[types]
+            self.shown_ids = ids.copy()
 
-        self.change_angle = random.uniform(-2, 2)
+        self.frame += 1
+        if texture is None and self.frame % self.fade_interval != 0:
+            alphas = None
 
-        self.alpha = OBSTACLE_HARMLESS_ALPHA
+        self.write(center_x, center_y, angle, alphas, width, height, texture)
 
-        if spawn_on_edge is False:
-            self.harmless_timer = OBSTACLE_HARMLESS_TIME
-            self.is_harmless = True
-        else:
-            self.harmless_timer = 0
-            self.is_harmless = False
 
-    def on_update(self, delta_time):
-        self.center_x += self.change_x
-        self.center_y += self.change_y
+class ParticleSpriteList(BufferSpriteList):
+    """
+    Draws the particles of a particles.ParticleSystem
+    """
 
-        if self.left > SCREEN_WIDTH:
-            self.kill()
-        elif self.right < 0:
-            self.kill()
-        elif self.bottom > SCREEN_HEIGHT:
-            self.kill()
-        elif self.top < 0:
-            self.kill()
+    def __init__(self, atlas, textures):
 
-        if self.harmless_timer > 0:
-            self.is_harmless = True
-            self.alpha = min(255 / self.harmless_timer, 255)
-            self.harmless_timer -= delta_time
-        else:
-            self.is_harmless = False
-            self.alpha = 255
+        super().__init__(atlas)
 
-        if self.is_harmless:
-            self.change_x = self.speed_x * OBSTACLE_HARMLESS_SPEED_FACTOR
-            self.change_y = self.speed_y * OBSTACLE_HARMLESS_SPEED_FACTOR
-            self.angle += self.change_angle * OBSTACLE_HARMLESS_SPEED_FACTOR
-        else:
-            self.change_x = self.speed_x
-            self.change_y = self.speed_y
-            self.angle += self.change_angle
+        # texture of every graphic of the particle system, in its order
+        self.textures = textures
+        self.particle_texture_slots = None
+
+    def sync(self, particles):
+        if self.particle_texture_slots is None:
+            self.particle_texture_slots = self.texture_slots(self.textures)
+
+        n = len(particles)
+        self.write(particles.center_x[:n], particles.center_y[:n], particles.angle[:n], particles.alpha[:n],
+                   particles.width[:n], particles.height[:n], self.particle_texture_slots[particles.texture[:n]])
 
 
 class PlayerShot(arcade.Sprite):
@@ -291,63 +278,56 @@ class PlayerShot(arcade.Sprite):
 
 
 class PowerUp(arcade.Sprite):
-    def __init__(self):
+    """
+    A power-up, drawn from a simulation.PowerUpState
+    """
 
-        super().__init__("images/Power-ups/powerupRed_star.png", SPRITE_SCALING * 3)
+    graphics = POWERUP_GRAPHICS
+    # what the sprite shows, the state may already be reused for another kind when the sprite goes
+    kind = None
 
-        self.center_x = random.randint(0, SCREEN_WIDTH)
-        self.center_y = random.randint(0, SCREEN_HEIGHT)
-        self.powerup_alive_timer = POWERUP_ALIVE_TIME
-        self.sound = arcade.sound.load_sound(':resources:sounds/upgrade4.wav')
-        self.sound.play(volume=0)
+    def __init__(self, state, assets):
 
-    def on_update(self, delta_time):
+        super().__init__(scale=POWERUP_SCALING)
+
+        self.texture = assets.texture(self.graphics)
 
-        self.powerup_alive_timer -= delta_time
+        self.state = state
 
-        # powerup fades out when only half of its alive time is left
-        try:
-            if self.powerup_alive_timer <= POWERUP_ALIVE_TIME / 2:
-                self.alpha = (255 / POWERUP_ALIVE_TIME) * (self.powerup_alive_timer * 2)
-        except ValueError:
-            self.alpha = 0
+        self.sync()
 
-    def pick_up(self, player):
+    def show(self, state):
         """
-        what to happen when powerup is picked up
+        Reuse the sprite for another power-up of the same kind
         """
+        self.state = state
+        self.sync()
 
+    def sync(self):
+        """
+        Copy the simulated state onto the sprite
+        """
+        self.center_x = self.state.center_x
+        self.center_y = self.state.center_y
+        self.alpha = self.state.alpha
 
-class PowerUpExtraLife(PowerUp):
-
-    def __init__(self):
-
-        super().__init__()
 
-        self.texture = arcade.load_texture("images/Power-ups/powerupRed_shield.png")
+class PowerUpExtraLife(PowerUp):
 
-    def pick_up(self, player):
-        """
-        what to happen when powerup is picked up
-        """
-        player.player_lives += 1
-        self.sound.play()
+    graphics = POWERUP_EXTRA_LIFE_GRAPHICS
+    kind = PowerUpState.EXTRA_LIFE
 
 
 class PowerUpExtraScore(PowerUp):
 
-    def __init__(self):
+    graphics = POWERUP_EXTRA_SCORE_GRAPHICS
+    kind = PowerUpState.EXTRA_SCORE
 
-        super().__init__()
 
-        self.texture = arcade.load_texture("images/Power-ups/powerupBlue_star.png")
-
-    def pick_up(self, player):
-        """
-        what to happen when powerup is picked up
-        """
-        player.player_score += 200
-        self.sound.play()
+POWERUP_SPRITES = {
+    PowerUpState.EXTRA_LIFE: PowerUpExtraLife,
+    PowerUpState.EXTRA_SCORE: PowerUpExtraScore,
+}
 
 
 class MyGame(arcade.Window):
@@ -355,38 +335,100 @@ class MyGame(arcade.Window):
     Main application class.
     """
 
-    def __init__(self, width, height):
+    def __init__(self, width, height, start_time=None, startup_report=False, render_rate=RENDER_RATE,
+                 seed=None, record_path=None, profile=False, profile_export=None, adaptive_quality=True,
+                 threaded=False):
         """
         Initializer
         """
 
         # Call the parent class initializer
-        super().__init__(width, height)
+        super().__init__(width, height, update_rate=1 / render_rate)
+        # frames per second asked for, and drawn right now
+        self.render_rate = render_rate
+        self.current_render_rate = render_rate
+
+        # when the game was started, for the time to first frame
+        self.start_time = start_time if start_time is not None else time.perf_counter()
+        self.startup_report = startup_report
+        self.first_frame_drawn = False
+
+        # Decode everything up front, sprites share these textures and sounds
+        self.assets = AssetRegistry()
+        self.assets.load()
+        self.assets.build_atlas()
+
+        # Text shown on screen, only laid out again when it changes
+        self.game_hud = Hud()
+        self.game_hud.add("lives", "LIVES: {}", 10, SCREEN_HEIGHT - 20)
+        self.game_hud.add("score", "score: {}", 10, SCREEN_HEIGHT - 40)
+        self.game_hud.add("level_timer", "Next level in: {}", 10, SCREEN_HEIGHT - 60)
+        self.game_hud.add("level", "Level: {}", 10, SCREEN_HEIGHT - 80)
+
+        self.intro_hud = Hud()
+        self.intro_hud.add("start", "press space to start!",
+                           SCREEN_WIDTH / 2 - 230, SCREEN_HEIGHT / 2, arcade.color.PINK, 40)
+        self.intro_hud.add("quit", "press esc to quit!",
+                           SCREEN_WIDTH / 2 - 230, SCREEN_HEIGHT / 2 - 50, arcade.color.PINK, 20)
+
+        self.game_over_hud = Hud()
+        self.game_over_hud.add("final_score", "final score: {}",
+                               SCREEN_WIDTH / 2 - 160, SCREEN_HEIGHT / 2 - 60, arcade.color.PINK, 30)
+        self.game_over_hud.add("game_over", "game over!",
+                               SCREEN_WIDTH / 2 - 260, SCREEN_HEIGHT / 2 + 75, arcade.color.PINK, 80)
+        self.game_over_hud.add("restart", "press space to restart!",
+                               SCREEN_WIDTH / 2 - 270, SCREEN_HEIGHT / 2, arcade.color.PINK, 40)
+
+        # Frame time instrumentation, see profiler.py
+        if profile or profile_export:
+            self.profiler = Profiler(export_path=profile_export)
+        else:
+            self.profiler = NullProfiler()
+        self.show_profiler = profile
+        self.profiler_hud = Hud()
 
-        self.powerup_spawn_timer = None
-        #self.cool_sound = arcade.sound.load_sound(':resources:sounds/upgrade1.wav')
-        # print(self.get_viewport())
+        # Turns down effects when frames take too long, see governor.py
+        self.governor = QualityGovernor(1 / render_rate) if adaptive_quality else None
+        # seconds spent updating since the last frame was drawn
+        self.update_cost = 0
 
-        self.level_timer = None
+        # print(self.get_viewport())
 
-        # Variable that will hold a list of shots fired by the player
+        # The game logic, see simulation.py
+        self.simulation = None
+        # generates the next level's obstacles while the current one plays
+        self.level_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="level")
+        # seed for every session, a new random one each time if None
+        self.seed = seed
+        # where to save a replay of each session, see replay.py
+        self.record_path = record_path
+        self.recorder = None
+        # time not simulated yet, less than one SIMULATION_STEP
+        self.time_to_simulate = 0
+        # steps the simulation on its own thread if threaded, see simulation_thread.py
+        self.threaded = threaded
+        self.simulation_thread = None
+        # the window's copy of the thread's newest FrameState, drawn without holding its lock
+        self.frame_state = None
+
+        # Sprite lists drawing the simulated obstacles and power-ups
         self.player_shot_list = None
         self.obstacle_list = None
-        self.number_of_obstacles = None
 
         self.powerup_list = None
+        self.powerup_sprites = None
+        self.powerup_sprite_pool = None
+
+        # Explosions and dash trails, only drawn, see particles.py
+        self.particles = None
+        self.particle_list = None
 
         # Set up the player info
         self.player_sprite = None
-        # Track the current mode of what key is pressed
-        self.left_pressed = False
-        self.right_pressed = False
-        self.up_pressed = False
-        self.down_pressed = False
+        # Key and joystick events, read by the simulation every tick, see controls.py
+        self.input_buffer = InputBuffer()
         self.kill_button_pressed = False
 
-        self.current_level = None
-
         self.mode = None
 
         # Get list of joysticks
@@ -411,36 +453,75 @@ class MyGame(arcade.Window):
             print("No joysticks found")
             self.joystick = None
 
-            # self.joystick.
+        # the keys held and the joystick position as of the last tick
+        self.input_state = InputState(joystick=self.joystick is not None)
+
         # Set the background color
         arcade.set_background_color(arcade.color.BLACK)
 
     def setup(self):
         """ Set up the game and initialize the variables. """
 
-        self.powerup_spawn_timer = 0
-
         self.set_mode("INTRO")
 
         # if self.mode == "IN_GAME":
 
+        self.stop_simulation_thread()
+        # the profiler isn't thread safe, the simulation thread times its ticks itself
+        profiler = NullProfiler() if self.threaded else self.profiler
+        self.simulation = Simulation(self.seed, profiler=profiler, executor=self.level_executor)
+
+        if self.record_path:
+            self.stop_recording()
+            self.recorder = ReplayRecorder(self.record_path, self.simulation.seed)
+        self.time_to_simulate = 0
+
         # Sprite lists
         self.player_shot_list = arcade.SpriteList()
 
-        self.powerup_list = arcade.SpriteList()
+        self.obstacle_list = ObstacleSpriteList(self.assets.atlas, {
+            type: self.assets.texture(graphics) for type, graphics in self.simulation.obstacles.type_graphics.items()
+        })
+
+        self.powerup_list = arcade.SpriteList(atlas=self.assets.atlas)
+        # power-up sprites by PowerUpState.id
+        self.powerup_sprites = {}
+        self.powerup_sprite_pool = {kind: [] for kind in POWERUP_SPRITES}
+
+        self.particles = ParticleSystem()
+        self.particle_list = ParticleSpriteList(
+            self.assets.atlas, [self.assets.texture(graphics) for graphics in self.particles.graphics])
 
         # Create a Player object
-        self.player_sprite = Player(
-            center_x=PLAYER_START_X,
-            center_y=PLAYER_START_Y
-        )
+        self.player_sprite = Player(self.simulation.player, self.assets)
+
+        self.apply_quality()
+        self.sync_sprites(self.simulation)
+
+    def apply_quality(self):
+        """
+        Turn the governor's degradations on or off
+        """
+        governor = self.governor
+        if governor is None:
+            return
 
-        self.current_level = 0
-        self.obstacle_speed = OBSTACLE_SPEED
+        if governor.is_active("no_particles"):
+            self.particles.density = 0
+            self.particles.clear()
+        elif governor.is_active("fewer_particles"):
+            self.particles.density = 0.5
+        else:
+            self.particles.density = 1
 
-        self.number_of_obstacles = OBSTACLE_AMOUNT
+        self.obstacle_list.fade_interval = COARSE_FADE_INTERVAL if governor.is_active("coarse_fades") else 1
 
-        self.new_level()
+        render_rate = self.render_rate / 2 if governor.is_active("half_render_rate") else self.render_rate
+        if render_rate != self.current_render_rate:
+            self.current_render_rate = render_rate
+            # sprites, particles and the HUD only change in on_update, the redraws in between
+            # draw the same buffers again without uploading anything
+            self.set_update_rate(1 / render_rate)
 
     def set_mode(self, mode):
 
@@ -449,7 +530,9 @@ class MyGame(arcade.Window):
 
         if mode == "IN_GAME":
             self.setup()
-            self.player_sprite.player_score = 0
+            if self.threaded:
+                # only now, the simulation must not tick or record behind the intro
+                self.start_simulation_thread()
 
         if mode == "INTRO":
             pass
@@ -459,229 +542,240 @@ class MyGame(arcade.Window):
 
         self.mode = mode
 
-    def new_level(self):
-
-        self.level_timer = LEVEL_TIME
-
-        self.obstacle_list = arcade.SpriteList()
-        self.number_of_obstacles += self.current_level
-        self.current_level += 1
-
-        # Increases obstacle_speed with 50%
-        self.obstacle_speed *= 1.5
+    def sync_sprites(self, state, alpha=1):
+        """
+        Create, update and remove sprites to match state, the Simulation or a FrameState of it.
 
-        for i in range(self.number_of_obstacles):
-            self.obstacle_list.append(Obstacle(speed=self.obstacle_speed, type=random.randint(1, 3)))
+        Moving things are drawn alpha of the way from the previous tick to the current one.
+        """
+        self.player_sprite.state = state.player
+        self.player_sprite.sync(alpha)
+
+        self.obstacle_list.sync(state.obstacles, alpha)
+
+        self.particle_list.sync(self.particles)
+
+        powerups = state.powerups
+        if len(self.powerup_sprites) != len(powerups) or any(
+                state.id not in self.powerup_sprites for state in powerups):
+            alive = set(state.id for state in powerups)
+            for powerup_id in [powerup_id for powerup_id in self.powerup_sprites if powerup_id not in alive]:
+                sprite = self.powerup_sprites.pop(powerup_id)
+                sprite.remove_from_sprite_lists()
+                self.powerup_sprite_pool[sprite.kind].append(sprite)
+
+        for state in powerups:
+            sprite = self.powerup_sprites.get(state.id)
+            if sprite is None:
+                pool = self.powerup_sprite_pool[state.kind]
+                if pool:
+                    sprite = pool.pop()
+                    sprite.show(state)
+                else:
+                    sprite = POWERUP_SPRITES[state.kind](state, self.assets)
+                self.powerup_sprites[state.id] = sprite
+                self.powerup_list.append(sprite)
+            else:
+                # a FrameState has new copies of the power-ups every tick
+                sprite.show(state)
+
+        self.game_hud.set("lives", state.player.player_lives)
+        self.game_hud.set("score", int(state.player.player_score) * 10)
+        self.game_hud.set("level_timer", int(state.level_time_left))
+        self.game_hud.set("level", int(state.current_level))
 
     def on_draw(self):
         """
         Render the screen.
         """
 
+        draw_start = time.perf_counter()
+
         # This command has to happen before we start drawing
         arcade.start_render()
 
+        profiler = self.profiler
+
         if self.mode == "IN_GAME":
 
             self.set_mode(self.mode)
 
-            # Draw the obstacles
-            self.obstacle_list.draw()
+            with profiler.scope("draw_sprites"):
+                # Draw the obstacles
+                self.obstacle_list.draw()
+
+                self.particle_list.draw(blend_function=self.ctx.BLEND_ADDITIVE)
+
+                # Draw the player sprite
+                self.player_sprite.draw()
+
+                self.powerup_list.draw()
 
-            # Draw the player sprite
-            self.player_sprite.draw()
-
-            self.powerup_list.draw()
-
-            # Draw players score on screen
-            arcade.draw_text(
-                "LIVES: {}".format(self.player_sprite.player_lives),  # Text to show
-                10,  # X position
-                SCREEN_HEIGHT - 20,  # Y position
-                arcade.color.WHITE  # Color of text
-            )
-
-            arcade.draw_text(
-                "score: {}".format(int(self.player_sprite.player_score) * 10),  # Text to show
-                10,  # X position
-                SCREEN_HEIGHT - 40,  # Y position
-                arcade.color.WHITE  # Color of text
-            )
-
-            arcade.draw_text(
-                "Next level in: {}".format(int(self.level_timer)),  # Text to show
-                10,  # X position
-                SCREEN_HEIGHT - 60,  # Y position
-                arcade.color.WHITE  # Color of text
-            )
-
-            arcade.draw_text(
-                "Level: {}".format(int(self.current_level)),  # Text to show
-                10,  # X position
-                SCREEN_HEIGHT - 80,  # Y position
-                arcade.color.WHITE  # Color of text
-            )
+            with profiler.scope("draw_hud"):
+                # Draw players score on screen, set in sync_sprites
+                self.game_hud.draw()
 
         elif self.mode == "INTRO":
 
             self.set_mode(self.mode)
 
-            arcade.draw_text(
-                "press space to start!",  # Text to show
-                SCREEN_WIDTH / 2 - 230,  # X position
-                SCREEN_HEIGHT / 2,  # Y position
-                arcade.color.PINK,  # Color of text
-                40,  # width
-            )
-
-            arcade.draw_text(
-                "press esc to quit!",  # Text to show
-                SCREEN_WIDTH / 2 - 230,  # X position
-                SCREEN_HEIGHT / 2 - 50,  # Y position
-                arcade.color.PINK,  # Color of text
-                20,  # width
-            )
+            self.intro_hud.draw()
 
         if self.mode == "GAME_OVER":
             self.set_mode(self.mode)
 
             self.obstacle_list.draw()
 
-            arcade.draw_text(
-                "final score: {}".format(int(self.player_sprite.player_score) * 10),  # Text to show
-                SCREEN_WIDTH / 2 - 160,  # X position
-                SCREEN_HEIGHT / 2 - 60,  # Y position
-                arcade.color.PINK,  # Color of text
-                30
-            )
-
-            arcade.draw_text(
-                "game over!",  # Text to show
-                SCREEN_WIDTH / 2 - 260,  # X position
-                SCREEN_HEIGHT / 2 + 75,  # Y position
-                arcade.color.PINK,  # Color of text
-                80
-            )
-
-            arcade.draw_text(
-                "press space to restart!",  # Text to show
-                SCREEN_WIDTH / 2 - 270,  # X position
-                SCREEN_HEIGHT / 2,  # Y position
-                arcade.color.PINK,  # Color of text
-                40
-            )
-
-    def on_update(self, delta_time):
-        """
-        Movement and game logic
-        """
-
-        if self.mode == "IN_GAME":
-
-            # Calculate player speed based on the keys pressed
-            self.player_sprite.change_x = 0
-            self.player_sprite.change_y = 0
-
-            obstacles_colliding_with_player = arcade.check_for_collision_with_list(
-                self.player_sprite, self.obstacle_list
-            )
-            for o in obstacles_colliding_with_player:
-                if self.player_sprite.is_dashing is False and not o.is_harmless:
-                    self.player_sprite.taking_damage()
-
-            powerups_colliding_with_player = self.player_sprite.collides_with_list(self.powerup_list)
-
-            for powerup in powerups_colliding_with_player:
-                powerup.pick_up(self.player_sprite)
-                powerup.kill()
-
-            # Move player with keyboard
-            if self.left_pressed and not self.right_pressed:
-                self.player_sprite.change_x = -PLAYER_SPEED_X
-
-            if self.right_pressed and not self.left_pressed:
-                self.player_sprite.change_x = PLAYER_SPEED_X
-
-            if self.up_pressed and not self.down_pressed:
-                self.player_sprite.change_y = PLAYER_SPEED_Y
+            self.game_over_hud.set("final_score", int(self.simulation.player.player_score) * 10)
+            self.game_over_hud.draw()
 
-            if self.down_pressed and not self.up_pressed:
-                self.player_sprite.change_y = - PLAYER_SPEED_Y
+        if not self.first_frame_drawn:
+            self.first_frame_drawn = True
+            if self.startup_report:
+                print(self.assets.report(time.perf_counter() - self.start_time))
 
-            if self.player_sprite.change_x > 0 and self.player_sprite.change_y == 0:
-                self.player_sprite.wanted_angle = self.player_sprite.angle - 90 - self.player_sprite.angle
+        if self.show_profiler:
+            self.draw_profiler_overlay()
+        profiler.end_frame()
 
-            if self.player_sprite.change_x > 0 and self.player_sprite.change_y > 0:
-                self.player_sprite.wanted_angle = self.player_sprite.angle - 45 - self.player_sprite.angle
+        if self.governor is not None:
+            if self.governor.measure(self.update_cost + time.perf_counter() - draw_start):
+                print(self.governor.report())
+                if self.simulation is not None:
+                    self.apply_quality()
+        self.update_cost = 0
 
-            if self.player_sprite.change_x == 0 and self.player_sprite.change_y > 0:
-                self.player_sprite.wanted_angle = self.player_sprite.angle - 0 - self.player_sprite.angle
-
-            if self.player_sprite.change_x < 0 and self.player_sprite.change_y == 0:
-                self.player_sprite.wanted_angle = self.player_sprite.angle - -90 - self.player_sprite.angle
-
-            if self.player_sprite.change_x == 0 and self.player_sprite.change_y < 0:
-                self.player_sprite.wanted_angle = self.player_sprite.angle - -180 - self.player_sprite.angle
-
-            if self.player_sprite.change_x < 0 and self.player_sprite.change_y < 0:
-                self.player_sprite.wanted_angle = self.player_sprite.angle - -225 - self.player_sprite.angle
-
-            if self.player_sprite.change_x < 0 and self.player_sprite.change_y > 0:
-                self.player_sprite.wanted_angle = 45
-
-            if self.player_sprite.change_x > 0 and self.player_sprite.change_y < 0:
-                self.player_sprite.wanted_angle = -135
-
-            # Move player with joystick if present
-            if self.joystick:
-                self.player_sprite.change_x = round(self.joystick.x) * PLAYER_SPEED_X
-                self.player_sprite.change_y = round(self.joystick.y) * PLAYER_SPEED_Y * -1
-                if round(self.joystick.x) == 1:
-                    self.player_sprite.angle = -90
-                elif round(self.joystick.x) == -1:
-                    self.player_sprite.angle = 90
-                elif round(self.joystick.y) == 1:
-                    self.player_sprite.angle = 180
-                elif round(self.joystick.y) == -1:
-                    self.player_sprite.angle = 0
-
-            # Update player sprite
-            self.player_sprite.update(delta_time)
-
-            self.powerup_spawn_timer -= delta_time
-
-            # add missing obstacles
-            while len(self.obstacle_list) < self.number_of_obstacles:
-                self.obstacle_list.append(
-                    Obstacle(speed=self.obstacle_speed, type=random.randint(1, 3), spawn_on_edge=True))
-
-            if self.powerup_spawn_timer <= 0:
-                self.powerup_list.append(random.choice([PowerUpExtraLife(), PowerUpExtraScore()]))
-                # self.powerup_list.append(PowerUpExtraLife())
-
-                self.powerup_spawn_timer = 5
-
-            # Update the player shots
-            for o in self.obstacle_list:
-                o.on_update(delta_time)
-
-            for p in self.powerup_list:
-                p.on_update(delta_time)
-
-            self.level_timer -= delta_time
+    def draw_profiler_overlay(self):
+        """
+        Percentiles of every profiler scope in the top right corner
+        """
+        profiler = self.profiler
+        if profiler.frame % PROFILER_OVERLAY_INTERVAL == 0 or not self.profiler_hud.labels:
+            lines = profiler.report().split("\n")
+            if self.governor is not None:
+                lines.append(self.governor.report())
+            tick_costs = self.simulation_thread.recent_tick_costs() if self.simulation_thread is not None else None
+            if tick_costs:
+                lines.append("tick on thread  {:8.3f} ms p95".format(np.percentile(tick_costs, 95) * 1000))
+            for i, line in enumerate(lines):
+                if i not in self.profiler_hud.labels:
+                    self.profiler_hud.add(i, "{}", SCREEN_WIDTH - 300, SCREEN_HEIGHT - 20 - 16 * i,
+                                          arcade.color.YELLOW, 10)
+                self.profiler_hud.set(i, line)
+        self.profiler_hud.draw()
+
+    def read_inputs(self, until=None):
+        """
+        Inputs of a tick ending at perf_counter time until, called on the simulation thread if there is one
+        """
+        return self.input_state.inputs(self.input_buffer, until)
 
-            if self.level_timer <= 0:
-                self.new_level()
+    def play_events(self, events):
+        """
+        Sounds and particles for the events of simulation_thread.tick_events
+        """
+        for event in events:
+            if event[0] == "dash":
+                self.assets.play_sound(DASH_SOUND)
+            elif event[0] == "pick_up":
+                self.assets.play_sound(PICK_UP_SOUND)
+            elif event[0] == "impact":
+                self.particles.emit("explosion", event[1], event[2])
 
-            if self.obstacle_speed > Obstacle.obstacle_max_speed:
-                self.obstacle_speed = Obstacle.obstacle_max_speed
+    def on_update(self, delta_time):
+        """
+        Movement and game logic
+        """
 
-            if self.player_sprite.player_lives < 1:
-                self.obstacle_list.alpha = 255
-                self.set_mode("GAME_OVER")
+        update_start = time.perf_counter()
 
-        elif self.mode == "INTRO" or self.mode == "GAME_OVER":
-            self.player_sprite.player_lives = PLAYER_LIVES
+        if self.mode == "IN_GAME":
+            with self.profiler.scope("update"):
+
+                if self.simulation_thread is None:
+                    # Run as many fixed size ticks as fit into the time that passed
+                    self.time_to_simulate += delta_time
+                    steps = 0
+                    while self.time_to_simulate >= SIMULATION_STEP and not self.simulation.game_over:
+                        if steps == MAX_STEPS_PER_UPDATE:
+                            # can't keep up, let the game slow down instead of falling further behind
+                            self.time_to_simulate = 0
+                            break
+
+                        # the events that happened up to the end of this tick
+                        inputs = self.read_inputs(update_start - self.time_to_simulate + SIMULATION_STEP)
+                        was_dashing = self.simulation.player.is_dashing
+                        if self.recorder:
+                            self.simulation.step(SIMULATION_STEP, self.recorder.record(inputs))
+                        else:
+                            self.simulation.step(SIMULATION_STEP, inputs)
+                        self.time_to_simulate -= SIMULATION_STEP
+                        steps += 1
+
+                        self.play_events(tick_events(self.simulation, was_dashing))
+
+                    self.show_state(self.simulation, delta_time, self.time_to_simulate / SIMULATION_STEP)
+                    game_over = self.simulation.game_over
+                else:
+                    # the simulation thread keeps ticking, draw the newest tick it finished
+                    state = self.frame_state
+                    self.simulation_thread.copy_latest(state)
+                    self.play_events(self.simulation_thread.take_events())
+                    alpha = min((time.perf_counter() - state.published_at) / SIMULATION_STEP, 1)
+                    self.show_state(state, delta_time, alpha)
+                    game_over = state.game_over
+
+                if game_over:
+                    self.stop_simulation_thread()
+                    self.stop_recording()
+                    self.obstacle_list.alpha = 255
+                    self.set_mode("GAME_OVER")
+
+        elif self.simulation_thread is None:
+            # keep track of the keys held between games, the buffer would fill up otherwise.
+            # The buffer has a single reader: the thread while it runs, the window otherwise
+            self.read_inputs()
+
+        self.update_cost += time.perf_counter() - update_start
+
+    def show_state(self, state, delta_time, alpha):
+        """
+        Update the particles and sprites for state, the Simulation or a FrameState of it
+        """
+        with self.profiler.scope("particles"):
+            player = state.player
+            if player.is_dashing:
+                # the trail points away from where the player flies to
+                self.particles.stream("dash_trail", player.center_x, player.center_y, delta_time,
+                                      math.atan2(-player.change_y, -player.change_x))
+            self.particles.update(delta_time)
+
+        with self.profiler.scope("sync_sprites"):
+            self.sync_sprites(state, alpha)
+
+    def start_simulation_thread(self):
+        self.simulation_thread = SimulationThread(
+            self.simulation, self.read_inputs, self.recorder.record if self.recorder else None)
+        self.frame_state = FrameState(self.simulation)
+        self.simulation_thread.start()
+
+    def stop_simulation_thread(self):
+        if self.simulation_thread is not None:
+            self.simulation_thread.stop()
+            self.simulation_thread = None
+
+    def stop_recording(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+
+    def on_close(self):
+        self.stop_simulation_thread()
+        self.stop_recording()
+        self.profiler.close()
+        self.assets.sounds.stop_all()
+        self.level_executor.shutdown(wait=False, cancel_futures=True)
+        super().on_close()
 
     def on_key_press(self, key, modifiers):
         """
@@ -689,19 +783,15 @@ class MyGame(arcade.Window):
         """
 
         # Track mode of arrow keys
-        if key == arcade.key.UP:
-            self.up_pressed = True
-        elif key == arcade.key.DOWN:
-            self.down_pressed = True
-        elif key == arcade.key.LEFT:
-            self.left_pressed = True
-        elif key == arcade.key.RIGHT:
-            self.right_pressed = True
+        if key in MOVEMENT_KEYS:
+            self.input_buffer.press(MOVEMENT_KEYS[key])
+
+        if key == PROFILER_KEY and self.profiler.enabled:
+            self.show_profiler = not self.show_profiler
 
         if self.mode == "IN_GAME":
             if key == DASHING_KEY:
-                self.player_sprite.dash()
-                #self.cool_sound.play()
+                self.input_buffer.press(DASH)
 
         elif self.mode == "INTRO":
             if key == arcade.key.SPACE:
@@ -718,14 +808,10 @@ class MyGame(arcade.Window):
         Called whenever a key is released.
         """
 
-        if key == arcade.key.UP:
-            self.up_pressed = False
-        elif key == arcade.key.DOWN:
-            self.down_pressed = False
-        elif key == arcade.key.LEFT:
-            self.left_pressed = False
-        elif key == arcade.key.RIGHT:
-            self.right_pressed = False
+        if key in MOVEMENT_KEYS:
+            self.input_buffer.release(MOVEMENT_KEYS[key])
+        elif key == DASHING_KEY:
+            self.input_buffer.release(DASH)
 
     def on_joybutton_press(self, joystick, button_no):
         # print("Button pressed:", button_no)
@@ -735,24 +821,167 @@ class MyGame(arcade.Window):
 
     def on_joybutton_release(self, joystick, button_no):
         # print("Button released:", button_no)
-        pass
+        self.on_key_release(DASHING_KEY, [])
 
     def on_joyaxis_motion(self, joystick, axis, value):
-        print("Joystick axis {}, value {}".format(axis, value))
+        # the buffer drops motion inside the deadzone and jitter
+        self.input_buffer.axes(joystick.x, joystick.y)
 
     def on_joyhat_motion(self, joystick, hat_x, hat_y):
         # print("Joystick hat ({}, {})".format(hat_x, hat_y))
         pass
 
 
+class ClientWindow(arcade.Window):
+    """
+    Plays a multiplayer game, drawing the snapshots of a multiplayer.GameClient.
+
+    The connection runs on an asyncio event loop that the window drives
+    once per frame, so the client is only ever touched from this thread.
+    Obstacles and players are drawn between the last two snapshots, by
+    the time since the last one arrived.
+    """
+
+    def __init__(self, transport, host, port, render_rate=RENDER_RATE):
+
+        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, update_rate=1 / render_rate)
+
+        self.assets = AssetRegistry()
+        self.assets.load()
+        self.assets.build_atlas()
+
+        self.obstacle_list = ObstacleSpriteList(self.assets.atlas, {
+            type: self.assets.texture(graphics) for type, graphics in DEFINITIONS.graphics.items()
+        })
+        # one sprite per player, in the order of the snapshot
+        self.player_list = arcade.SpriteList(atlas=self.assets.atlas)
+        self.player_textures = {
+            "damage": self.assets.texture(PLAYER_DAMAGE_GRAPHICS),
+            "normal": self.assets.texture(PLAYER_GRAPHICS),
+        }
+
+        self.game_hud = Hud()
+        self.game_hud.add("lives", "LIVES: {}", 10, SCREEN_HEIGHT - 20)
+        self.game_hud.add("score", "score: {}", 10, SCREEN_HEIGHT - 40)
+        self.game_hud.add("level_timer", "Next level in: {}", 10, SCREEN_HEIGHT - 60)
+        self.game_hud.add("level", "Level: {}", 10, SCREEN_HEIGHT - 80)
+        self.game_over_hud = Hud()
+        self.game_over_hud.add("game_over", "game over!",
+                               SCREEN_WIDTH / 2 - 260, SCREEN_HEIGHT / 2 + 75, arcade.color.PINK, 80)
+
+        # the keys held are sent whenever the client is due to send inputs
+        self.input_buffer = InputBuffer()
+        self.input_state = InputState()
+        self.client = GameClient(lambda client: self.input_state.inputs(self.input_buffer))
+
+        self.loop = asyncio.new_event_loop()
+        self.playing = self.loop.create_task(connect(self.client, transport, host, port))
+
+        arcade.set_background_color(arcade.color.BLACK)
+
+    def on_update(self, delta_time):
+        # send and receive whatever is due, without waiting for anything
+        self.loop.run_until_complete(asyncio.sleep(0))
+        if self.playing.done():
+            # raises if the connection failed
+            self.playing.result()
+
+        client = self.client
+        alpha = client.alpha()
+        self.obstacle_list.show(*client.interpolated_obstacles(alpha))
+
+        players = client.players
+        while len(self.player_list) < len(players):
+            self.player_list.append(arcade.Sprite(scale=SPRITE_SCALING, texture=self.player_textures["normal"]))
+        for sprite, x, y, row in zip(self.player_list, *client.interpolated_players(alpha), players):
+            sprite.center_x = x
+            sprite.center_y = y
+            sprite.angle = row["angle"] / ANGLE_SCALE
+            sprite.texture = self.player_textures["damage" if row["flags"] & IS_TAKING_DAMAGE else "normal"]
+            if row["flags"] & GAME_OVER:
+                sprite.alpha = 0
+            else:
+                sprite.alpha = DASH_ALPHA if row["flags"] & IS_DASHING else 255
+
+        if client.player_index is not None:
+            player = players[client.player_index]
+            self.game_hud.set("lives", int(player["lives"]))
+            self.game_hud.set("score", int(player["score"]))
+        self.game_hud.set("level_timer", int(client.level_time_left))
+        self.game_hud.set("level", client.current_level)
+
+    def on_draw(self):
+        arcade.start_render()
+        self.obstacle_list.draw()
+        self.player_list.draw()
+        self.game_hud.draw()
+        if self.client.game_over:
+            self.game_over_hud.draw()
+
+    def on_key_press(self, key, modifiers):
+        if key in MOVEMENT_KEYS:
+            self.input_buffer.press(MOVEMENT_KEYS[key])
+        elif key == DASHING_KEY:
+            self.input_buffer.press(DASH)
+        elif key == arcade.key.ESCAPE:
+            self.on_close()
+
+    def on_key_release(self, key, modifiers):
+        if key in MOVEMENT_KEYS:
+            self.input_buffer.release(MOVEMENT_KEYS[key])
+        elif key == DASHING_KEY:
+            self.input_buffer.release(DASH)
+
+    def on_close(self):
+        self.playing.cancel()
+        self.loop.run_until_complete(asyncio.gather(self.playing, return_exceptions=True))
+        self.loop.close()
+        print(self.client.report())
+        super().on_close()
+
+
 def main():
     """
     Main method
     """
 
-    window = MyGame(SCREEN_WIDTH, SCREEN_HEIGHT)
-    window.setup()
-    arcade.run()
+    start_time = time.perf_counter()
+
+    parser = argparse.ArgumentParser(description="Dodge the flying meteors")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print how long loading each asset and drawing the first frame took")
+    parser.add_argument("--render-rate", type=float, default=RENDER_RATE,
+                        help="frames per second to draw, e.g. 30 on slow machines")
+    parser.add_argument("--seed", type=int, default=None, help="seed for every game, random if left out")
+    parser.add_argument("--record", metavar="FILE", default=None,
+                        help="save a replay of the last game, play it with replay.py")
+    parser.add_argument("--profile", action="store_true",
+                        help="show frame time percentiles of every phase, F3 hides them")
+    parser.add_argument("--profile-export", metavar="FILE", default=None,
+                        help="write the time of every phase in every frame to a CSV file")
+    parser.add_argument("--fixed-quality", action="store_true",
+                        help="keep all effects on even when frames take too long")
+    parser.add_argument("--simulation-thread", action="store_true",
+                        help="run the game logic on its own thread, so slow frames don't delay it")
+    parser.add_argument("--connect", metavar="HOST", default=None,
+                        help="play on a multiplayer server instead, see multiplayer.py")
+    parser.add_argument("--port", type=int, default=PORT, help="port of the multiplayer server")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="tcp", help="how to reach the multiplayer server")
+    args = parser.parse_args()
+
+    if args.connect is not None:
+        ClientWindow(args.transport, args.connect, args.port, args.render_rate)
+    else:
+        window = MyGame(SCREEN_WIDTH, SCREEN_HEIGHT, start_time=start_time, startup_report=args.startup_report,
+                        render_rate=args.render_rate, seed=args.seed, record_path=args.record,
+                        profile=args.profile, profile_export=args.profile_export,
+                        adaptive_quality=not args.fixed_quality, threaded=args.simulation_thread)
+        window.setup()
+    if args.render_rate == RENDER_RATE:
+        arcade.run()
+    else:
+        # arcade.run() always redraws at 60 fps
+        pyglet.app.run(1 / args.render_rate)
 
 
 if __name__ == "__main__":
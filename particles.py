@@ -0,0 +1,206 @@
+"""
+Particle effects for meteor impacts and dash trails.
+
+Particles live in NumPy arrays, one per field, like the obstacles in
+simulation.ObstacleStore. A whole explosion is spawned, moved and faded
+with a few array operations and drawn as one batch by
+ParticleSpriteList in my_game.py. Particles are only drawn, they never
+touch the game logic, so they are updated once per frame and not per
+simulation tick. Nothing in here depends on arcade.
+
+What a particle does is set by its emitter in EMITTERS: how many are
+emitted, how fast they fly, how long they live and how their alpha and
+scale change over their life.
+"""
+
+import math
+
+import numpy as np
+
+from simulation import MOVEMENT_FPS, SPRITE_SCALING, image_size
+
+FIRE_GRAPHICS = tuple("images/Effects/fire{:02}.png".format(i) for i in range(20))
+
+# most particles alive at once, emitting more than fit drops the extra ones
+MAX_PARTICLES = 5000
+
+EMITTERS = {
+    # a meteor hitting the player
+    "explosion": {
+        # each particle picks one of these at random
+        "graphics": FIRE_GRAPHICS,
+        # particles per emit
+        "count": 120,
+        # pixels per frame at MOVEMENT_FPS, like all speeds
+        "speed": (1, 8),
+        # radians around the emit direction particles fly in
+        "spread": 2 * math.pi,
+        # seconds
+        "lifetime": (0.3, 0.9),
+        # fraction of the speed lost per second
+        "drag": 2,
+        # (fraction of the lifetime, value) points, values in between are interpolated
+        "alpha": ((0, 255), (0.5, 200), (1, 0)),
+        "scale": ((0, SPRITE_SCALING * 4), (1, SPRITE_SCALING)),
+    },
+    # behind the player while dashing
+    "dash_trail": {
+        "graphics": FIRE_GRAPHICS,
+        # particles per second when streamed
+        "rate": 300,
+        "speed": (1, 3),
+        "spread": 0.8,
+        "lifetime": (0.15, 0.35),
+        "drag": 4,
+        "alpha": ((0, 160), (1, 0)),
+        "scale": ((0, SPRITE_SCALING * 3), (1, SPRITE_SCALING)),
+    },
+}
+
+
+class ParticleSystem:
+    """
+    All live particles, as a struct of arrays.
+
+    Particles are kept in emit order in the first count slots. Dead ones
+    are dropped on update and the others move up, so the newest are
+    always drawn on top.
+    """
+
+    FIELDS = (
+        ("emitter", np.int8),
+        ("texture", np.int16),
+        ("center_x", np.float32),
+        ("center_y", np.float32),
+        ("change_x", np.float32),
+        ("change_y", np.float32),
+        ("angle", np.float32),
+        ("age", np.float32),
+        ("lifetime", np.float32),
+        # set from the emitter's curves on update
+        ("alpha", np.float32),
+        ("width", np.float32),
+        ("height", np.float32),
+    )
+
+    def __init__(self, emitters=EMITTERS, capacity=MAX_PARTICLES, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.capacity = capacity
+        self.count = 0
+        # share of every emitter's particles that are emitted, lowered on slow machines
+        self.density = 1
+
+        for name, dtype in self.FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype))
+
+        # textures of all emitters, particles refer to them by index
+        self.graphics = []
+        self.emitters = {}
+        for index, (name, emitter) in enumerate(emitters.items()):
+            first = len(self.graphics)
+            self.graphics.extend(emitter["graphics"])
+            self.emitters[name] = dict(emitter, index=index, textures=np.arange(first, len(self.graphics)))
+        self.emitter_list = list(self.emitters.values())
+        self.texture_width = np.array([image_size(path)[0] for path in self.graphics], np.float32)
+        self.texture_height = np.array([image_size(path)[1] for path in self.graphics], np.float32)
+
+        # particles owed to streaming emitters, see stream
+        self.owed = {name: 0 for name in self.emitters}
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def emit(self, name, x, y, direction=0, count=None):
+        """
+        Emit count particles at x, y, or the emitter's count if None.
+
+        They fly towards direction, in radians, give or take half the
+        emitter's spread. Returns how many fit under the cap.
+        """
+        emitter = self.emitters[name]
+        if count is None:
+            count = int(emitter["count"] * self.density)
+        start = self.count
+        amount = min(count, self.capacity - start)
+        if amount <= 0:
+            return 0
+
+        rng = self.rng
+        s = slice(start, start + amount)
+        self.emitter[s] = emitter["index"]
+        self.texture[s] = rng.choice(emitter["textures"], amount)
+        self.center_x[s] = x
+        self.center_y[s] = y
+
+        heading = direction + rng.uniform(-0.5, 0.5, amount) * emitter["spread"]
+        speed = rng.uniform(*emitter["speed"], amount)
+        self.change_x[s] = np.cos(heading) * speed
+        self.change_y[s] = np.sin(heading) * speed
+        # the graphics point up, turn them to trail behind the particle
+        self.angle[s] = np.degrees(heading) + 90
+
+        self.age[s] = 0
+        self.lifetime[s] = rng.uniform(*emitter["lifetime"], amount)
+
+        self.count += amount
+        self.update_looks(s)
+        return amount
+
+    def stream(self, name, x, y, delta_time, direction=0):
+        """
+        Emit the emitter's rate of particles per second for delta_time seconds
+        """
+        owed = self.owed[name] + self.emitters[name]["rate"] * self.density * delta_time
+        count = int(owed)
+        self.owed[name] = owed - count
+        if count:
+            self.emit(name, x, y, direction, count)
+
+    def update(self, delta_time):
+        n = self.count
+        self.age[:n] += delta_time
+
+        alive = self.age[:n] < self.lifetime[:n]
+        if not alive.all():
+            n = self.count = int(np.count_nonzero(alive))
+            for name, dtype in self.FIELDS:
+                array = getattr(self, name)
+                array[:n] = array[:len(alive)][alive]
+
+        # frames at MOVEMENT_FPS this update stands for
+        frames = delta_time * MOVEMENT_FPS
+        self.center_x[:n] += self.change_x[:n] * frames
+        self.center_y[:n] += self.change_y[:n] * frames
+
+        for emitter in self.emitter_list:
+            if emitter["drag"]:
+                of_emitter = self.emitter[:n] == emitter["index"]
+                slowdown = max(0, 1 - emitter["drag"] * delta_time)
+                self.change_x[:n][of_emitter] *= slowdown
+                self.change_y[:n][of_emitter] *= slowdown
+
+        self.update_looks(slice(0, n))
+
+    def update_looks(self, s):
+        """
+        Alpha and size of the particles in slice s for their age
+        """
+        life = self.age[s] / self.lifetime[s]
+        emitters = self.emitter[s]
+        scale = np.zeros(len(life), np.float32)
+        alpha = self.alpha[s]
+        for emitter in self.emitter_list:
+            of_emitter = emitters == emitter["index"]
+            if not of_emitter.any():
+                continue
+            points = np.array(emitter["alpha"], np.float32)
+            alpha[of_emitter] = np.interp(life[of_emitter], points[:, 0], points[:, 1])
+            points = np.array(emitter["scale"], np.float32)
+            scale[of_emitter] = np.interp(life[of_emitter], points[:, 0], points[:, 1])
+
+        texture = self.texture[s]
+        self.width[s] = self.texture_width[texture] * scale
+        self.height[s] = self.texture_height[texture] * scale
@@ -0,0 +1,155 @@
+"""
+Frame time instrumentation.
+
+Wrap a phase of the frame in a named scope:
+
+    with profiler.scope("collisions"):
+        ...
+
+and call end_frame once per frame. The profiler keeps the time each
+scope took in the last frames and gives rolling p50/p95/p99 values. It
+can also write the time of every scope in every frame to a CSV file
+for offline analysis.
+"""
+
+import collections
+import time
+
+import numpy as np
+
+# frames the rolling percentiles are taken over
+FRAME_WINDOW = 300
+# rows buffered before the export file is written to
+EXPORT_BATCH = 1000
+
+PERCENTILES = (50, 95, 99)
+
+
+class Scope:
+    """
+    Adds up the time spent inside it during a frame
+    """
+
+    def __init__(self):
+        self.start = 0
+        self.total = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.total += time.perf_counter() - self.start
+
+
+class NullScope:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class NullProfiler:
+    """
+    Stands in for a Profiler when profiling is off, at next to no cost
+    """
+
+    enabled = False
+
+    def __init__(self):
+        self.null_scope = NullScope()
+
+    def scope(self, name):
+        return self.null_scope
+
+    def end_frame(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class Profiler:
+    """
+    Named timing scopes with rolling percentiles and optional CSV export
+    """
+
+    enabled = True
+
+    def __init__(self, window=FRAME_WINDOW, export_path=None):
+        # scopes by name, in the order they were first used
+        self.scopes = {}
+        # seconds per frame of every scope, and of the whole frame under "frame"
+        self.history = {"frame": collections.deque(maxlen=window)}
+        self.window = window
+
+        self.frame = 0
+        self.frame_start = time.perf_counter()
+
+        self.export_file = None
+        self.export_rows = []
+        if export_path is not None:
+            self.export_file = open(export_path, "w")
+            self.export_file.write("frame,scope,milliseconds\n")
+
+    def scope(self, name):
+        scope = self.scopes.get(name)
+        if scope is None:
+            scope = self.scopes[name] = Scope()
+            self.history[name] = collections.deque(maxlen=self.window)
+        return scope
+
+    def end_frame(self):
+        """
+        Store the times of the frame that just ended and start the next one
+        """
+        now = time.perf_counter()
+        frame_time = now - self.frame_start
+        self.frame_start = now
+
+        self.history["frame"].append(frame_time)
+        for name, scope in self.scopes.items():
+            self.history[name].append(scope.total)
+
+        if self.export_file is not None:
+            rows = self.export_rows
+            rows.append("{},frame,{:.4f}\n".format(self.frame, frame_time * 1000))
+            for name, scope in self.scopes.items():
+                rows.append("{},{},{:.4f}\n".format(self.frame, name, scope.total * 1000))
+            if len(rows) >= EXPORT_BATCH:
+                self.flush()
+
+        for scope in self.scopes.values():
+            scope.total = 0
+        self.frame += 1
+
+    def percentiles(self, name):
+        """
+        p50, p95 and p99 of a scope over the last frames, in milliseconds
+        """
+        times = self.history[name]
+        if not times:
+            return (0, 0, 0)
+        return tuple(np.percentile(np.array(times), PERCENTILES) * 1000)
+
+    def report(self):
+        """
+        Percentiles of every scope as text, one scope per line
+        """
+        lines = ["{:<14} {:>8} {:>8} {:>8}".format("ms", *("p{}".format(p) for p in PERCENTILES))]
+        for name in self.history:
+            lines.append("{:<14} {:8.3f} {:8.3f} {:8.3f}".format(name, *self.percentiles(name)))
+        return "\n".join(lines)
+
+    def flush(self):
+        if self.export_file is not None:
+            self.export_file.writelines(self.export_rows)
+            self.export_rows.clear()
+
+    def close(self):
+        if self.export_file is not None:
+            self.flush()
+            self.export_file.close()
+            self.export_file = None
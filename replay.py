@@ -0,0 +1,246 @@
+"""
+Recording and playing back sessions.
+
+A session only depends on its seed and the inputs of every tick, so that
+is all a replay stores. Inputs are packed into a button bitmask plus the
+joystick axes and run-length encoded, since they rarely change from one
+tick to the next.
+
+Play a replay back without a window, as fast as possible, with:
+
+    python replay.py session.replay
+
+"""
+
+import argparse
+import struct
+import time
+
+from simulation import SIMULATION_STEP, Inputs, Simulation
+from snapshot import Keyframes
+
+MAGIC = b"MGRP"
+# bumped when the game rules change, old replays would play out differently
+VERSION = 7
+
+# magic, version, seed, seconds per tick
+HEADER = struct.Struct("<4sBQd")
+# buttons, joystick x, joystick y, number of ticks
+RUN = struct.Struct("<BbbH")
+MAX_RUN_LENGTH = 0xFFFF
+
+# Button bits
+LEFT = 1
+RIGHT = 2
+UP = 4
+DOWN = 8
+DASH = 16
+JOYSTICK = 32
+
+# joystick axes are stored as -127..127
+JOYSTICK_SCALE = 127
+
+
+def pack_inputs(inputs):
+    """
+    Inputs as a (buttons, joystick x, joystick y) tuple
+    """
+    buttons = 0
+    if inputs.left:
+        buttons |= LEFT
+    if inputs.right:
+        buttons |= RIGHT
+    if inputs.up:
+        buttons |= UP
+    if inputs.down:
+        buttons |= DOWN
+    if inputs.dash:
+        buttons |= DASH
+
+    joystick_x = joystick_y = 0
+    if inputs.joystick_x is not None:
+        buttons |= JOYSTICK
+        joystick_x = max(-JOYSTICK_SCALE, min(JOYSTICK_SCALE, round(inputs.joystick_x * JOYSTICK_SCALE)))
+        joystick_y = max(-JOYSTICK_SCALE, min(JOYSTICK_SCALE, round(inputs.joystick_y * JOYSTICK_SCALE)))
+
+    return buttons, joystick_x, joystick_y
+
+
+def unpack_inputs(buttons, joystick_x, joystick_y):
+    inputs = Inputs(
+        left=bool(buttons & LEFT),
+        right=bool(buttons & RIGHT),
+        up=bool(buttons & UP),
+        down=bool(buttons & DOWN),
+        dash=bool(buttons & DASH),
+    )
+    if buttons & JOYSTICK:
+        inputs.joystick_x = joystick_x / JOYSTICK_SCALE
+        inputs.joystick_y = joystick_y / JOYSTICK_SCALE
+    return inputs
+
+
+class ReplayRecorder:
+    """
+    Writes the seed and the inputs of every tick to a file
+    """
+
+    def __init__(self, path, seed, tick_length=SIMULATION_STEP):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, tick_length))
+
+        self.run = None
+        self.run_length = 0
+
+    def record(self, inputs):
+        """
+        Record the inputs of one tick.
+
+        Returns the inputs as they will be played back, pass those to
+        Simulation.step so the recording matches the session exactly.
+        """
+        packed = pack_inputs(inputs)
+        if packed == self.run and self.run_length < MAX_RUN_LENGTH:
+            self.run_length += 1
+        else:
+            self._write_run()
+            self.run = packed
+            self.run_length = 1
+        return unpack_inputs(*packed)
+
+    def _write_run(self):
+        if self.run_length:
+            self.file.write(RUN.pack(*self.run, self.run_length))
+
+    def close(self):
+        self._write_run()
+        self.run_length = 0
+        self.file.close()
+
+
+class Replay:
+    """
+    A recorded session
+    """
+
+    def __init__(self, seed, tick_length, runs):
+        self.seed = seed
+        self.tick_length = tick_length
+        # (buttons, joystick x, joystick y, ticks) tuples
+        self.runs = runs
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+
+        magic, version, seed, tick_length = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("{} is not a replay".format(path))
+        if version != VERSION:
+            raise ValueError("{} has replay version {}, expected {}".format(path, version, VERSION))
+
+        runs = list(RUN.iter_unpack(data[HEADER.size:]))
+        return cls(seed, tick_length, runs)
+
+    def __len__(self):
+        return sum(run[3] for run in self.runs)
+
+    def inputs(self):
+        """
+        Inputs of every tick, in order
+        """
+        for buttons, joystick_x, joystick_y, ticks in self.runs:
+            inputs = unpack_inputs(buttons, joystick_x, joystick_y)
+            for i in range(ticks):
+                yield inputs
+
+    def play(self, ticks=None):
+        """
+        Run the session again without a window, as fast as possible.
+
+        Stops after ticks ticks if given. Returns the Simulation.
+        """
+        simulation = Simulation(self.seed)
+        for inputs in self.inputs():
+            if ticks is not None and simulation.tick >= ticks:
+                break
+            simulation.step(self.tick_length, inputs)
+        return simulation
+
+
+class ReplayPlayer:
+    """
+    Steps through a replay and can jump to any tick, using keyframes to seek backwards
+    """
+
+    def __init__(self, replay, keyframes=None):
+        self.replay = replay
+        self.inputs = list(replay.inputs())
+        self.keyframes = keyframes if keyframes is not None else Keyframes()
+
+        self.simulation = Simulation(replay.seed)
+        self.keyframes.record(self.simulation)
+
+    def __len__(self):
+        return len(self.inputs)
+
+    @property
+    def tick(self):
+        return self.simulation.tick
+
+    def step(self):
+        self.simulation.step(self.replay.tick_length, self.inputs[self.simulation.tick])
+        self.keyframes.record(self.simulation)
+
+    def seek(self, tick):
+        """
+        Bring the simulation to tick, the end of the replay at most
+        """
+        tick = max(0, min(tick, len(self.inputs)))
+        if not self.keyframes.seek(self.simulation, tick, self.inputs, self.replay.tick_length):
+            # the keyframe already left the ring buffer, start over
+            self.simulation = Simulation(self.replay.seed)
+            while self.simulation.tick < tick:
+                self.step()
+
+
+def main():
+    """
+    Main method
+    """
+    parser = argparse.ArgumentParser(description="Play back a replay without a window")
+    parser.add_argument("replay", help="replay file to play")
+    parser.add_argument("--ticks", type=int, default=None, help="stop after this many ticks")
+    parser.add_argument("--seek", type=int, default=None, metavar="TICK",
+                        help="after playing, jump back to TICK using keyframes")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.replay)
+
+    start = time.perf_counter()
+    simulation = replay.play(args.ticks)
+    elapsed = time.perf_counter() - start
+
+    print("seed: {}, ticks: {}, level: {}, score: {}, lives: {}".format(
+        simulation.seed, simulation.tick, simulation.current_level,
+        int(simulation.player.player_score) * 10, simulation.player.player_lives))
+    print("{:.0f} ticks per second, {:.0f}x real time".format(
+        simulation.tick / elapsed, simulation.tick * replay.tick_length / elapsed))
+
+    if args.seek is not None:
+        player = ReplayPlayer(replay)
+        player.seek(len(player))
+
+        start = time.perf_counter()
+        player.seek(args.seek)
+        elapsed = time.perf_counter() - start
+
+        simulation = player.simulation
+        print("seeked to tick {} in {:.2f} ms, level: {}, score: {}, lives: {}".format(
+            simulation.tick, elapsed * 1000, simulation.current_level,
+            int(simulation.player.player_score) * 10, simulation.player.player_lives))
+
+
+if __name__ == "__main__":
+    main()
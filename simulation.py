@@ -0,0 +1,1062 @@
+"""
+Game logic for the meteor dodging game.
+
+Nothing in here depends on arcade, so the game can be simulated without
+a window or GL context, e.g. on CI boxes or servers. MyGame in my_game.py
+drives a Simulation and only draws its state.
+
+Run headless with:
+
+    python simulation.py --ticks 100000
+
+"""
+
+import argparse
+import math
+import os
+import random
+import struct
+import time
+
+import numpy as np
+
+from broadphase import SpatialHash
+from definitions import DEFINITIONS
+from profiler import NullProfiler, Profiler
+from timers import TimerWheel
+
+SPRITE_SCALING = 0.3
+
+# Set the size of the screen
+SCREEN_WIDTH = 1000
+SCREEN_HEIGHT = 800
+
+# Variables controlling the player
+PLAYER_LIVES = 5
+PLAYER_SPEED_X = 10
+PLAYER_SPEED_Y = 10
+PLAYER_START_X = SCREEN_WIDTH / 2
+PLAYER_START_Y = SCREEN_HEIGHT / 2
+PLAYER_SHOT_SPEED = 4
+# obstacles on the first level, the level settings come from obstacles.json, see definitions.py
+OBSTACLE_AMOUNT = DEFINITIONS.levels["obstacles"]
+# every level adds this many obstacles times the number of the level before
+LEVEL_OBSTACLE_GROWTH = DEFINITIONS.levels["obstacle_growth"]
+# size of the spatial hash cells obstacles are sorted into for collision checks
+OBSTACLE_CELL_SIZE = 128
+# test the paths the player and obstacles took during a tick instead of only where they
+# ended up, so nothing can pass through the player between two ticks
+SWEPT_COLLISIONS = True
+DASHING_TIME = 0.3
+DASH_COOLDOWN = 1
+OBSTACLE_HARMLESS_TIME = 2.2
+OBSTACLE_HARMLESS_ALPHA = 100
+OBSTACLE_HARMLESS_SPEED_FACTOR = 0.3
+# length of a level in seconds
+LEVEL_TIME = DEFINITIONS.levels["time"]
+
+# ticks per second the game logic runs at, independent of the frame rate
+SIMULATION_RATE = 120
+SIMULATION_STEP = 1 / SIMULATION_RATE
+# timers fire on ticks of this many seconds
+TIMER_RESOLUTION = SIMULATION_STEP
+# speeds are given in pixels per frame at this frame rate
+MOVEMENT_FPS = 60
+SCORE_PER_SECOND = 60
+
+TAKING_DAMAGE_TIME = 0.75
+LIVES_TAKING_DAMAGE = 1
+DASH_ALPHA = 100
+
+POWERUP_ALIVE_TIME = 5
+POWERUP_SPAWN_TIME = 5
+POWERUP_SCALING = SPRITE_SCALING * 3
+POWERUP_EXTRA_SCORE = 200
+POWERUP_CELL_SIZE = 128
+
+PLAYER_GRAPHICS = "images/playerShip1_blue.png"
+POWERUP_GRAPHICS = "images/Power-ups/powerupRed_star.png"
+
+_image_sizes = {}
+
+
+def image_size(path):
+    """
+    Width and height of a png in images/, read from its header
+    """
+    if path not in _image_sizes:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), path), "rb") as f:
+            header = f.read(24)
+        _image_sizes[path] = struct.unpack(">II", header[16:24])
+    return _image_sizes[path]
+
+
+POWERUP_RADIUS = min(image_size(POWERUP_GRAPHICS)) * POWERUP_SCALING / 2
+
+
+def new_seed():
+    """
+    Random seed for a session
+    """
+    return random.randrange(2 ** 63)
+
+
+class Inputs:
+    """
+    What the player is doing during one tick
+    """
+
+    __slots__ = ("left", "right", "up", "down", "dash", "joystick_x", "joystick_y")
+
+    def __init__(self, left=False, right=False, up=False, down=False, dash=False,
+                 joystick_x=None, joystick_y=None):
+        self.left = left
+        self.right = right
+        self.up = up
+        self.down = down
+        # dash is a key press, so it should only be set for a single tick
+        self.dash = dash
+        # joystick axes, None when no joystick is connected
+        self.joystick_x = joystick_x
+        self.joystick_y = joystick_y
+
+
+class PlayerState:
+    """
+    The player
+    """
+
+    __slots__ = (
+        "center_x", "center_y", "change_x", "change_y", "angle", "previous_x", "previous_y", "previous_angle",
+        "width", "height", "radius", "is_taking_damage", "player_lives", "wanted_angle", "is_dashing",
+        "can_dash", "player_score",
+    )
+
+    def __init__(self, center_x=PLAYER_START_X, center_y=PLAYER_START_Y):
+        width, height = image_size(PLAYER_GRAPHICS)
+
+        self.center_x = center_x
+        self.center_y = center_y
+        self.change_x = 0
+        self.change_y = 0
+        self.angle = 0
+        # where the player was before the last update, to interpolate between ticks
+        self.previous_x = center_x
+        self.previous_y = center_y
+        self.previous_angle = 0
+        self.width = width * SPRITE_SCALING
+        self.height = height * SPRITE_SCALING
+        self.radius = min(self.width, self.height) / 2
+
+        # the Simulation's timers turn these off again
+        self.is_taking_damage = False
+
+        self.player_lives = PLAYER_LIVES
+
+        self.wanted_angle = 0
+
+        self.is_dashing = False
+        self.can_dash = True
+
+        self.player_score = 0
+
+    @property
+    def alpha(self):
+        return DASH_ALPHA if self.is_dashing else 255
+
+    def dash(self):
+        """
+        Enable Dashing, returns True if the dash started
+        """
+        if not self.is_dashing and self.can_dash:
+            self.is_dashing = True
+            self.can_dash = False
+            return True
+        return False
+
+    def taking_damage(self):
+        """
+        Lose a life unless already hurt, returns True if a life was lost
+        """
+        if not self.is_taking_damage:
+            self.is_taking_damage = True
+            self.player_lives -= LIVES_TAKING_DAMAGE
+            return True
+        return False
+
+    def interpolated(self, alpha):
+        """
+        Position and angle a fraction alpha of the way from the previous tick to this one
+        """
+        return (
+            self.previous_x + (self.center_x - self.previous_x) * alpha,
+            self.previous_y + (self.center_y - self.previous_y) * alpha,
+            self.previous_angle + (self.angle - self.previous_angle) * alpha,
+        )
+
+    def update(self, delta_time):
+        """
+        Move the player
+        """
+        self.previous_x = self.center_x
+        self.previous_y = self.center_y
+        self.previous_angle = self.angle
+
+        # frames at MOVEMENT_FPS this update stands for
+        frames = delta_time * MOVEMENT_FPS
+
+        # turn a tenth of the way to wanted_angle per frame
+        d = self.angle - self.wanted_angle
+        self.angle -= d * (1 - 0.9 ** frames)
+
+        if self.is_dashing:
+            self.center_x += self.change_x * 3 * frames
+            self.center_y += self.change_y * 3 * frames
+        else:
+            self.center_x += self.change_x * frames
+            self.center_y += self.change_y * frames
+
+        # Don't let the player move off-screen
+        if self.center_x - self.width / 2 < 0:
+            self.center_x = self.width / 2
+        elif self.center_x + self.width / 2 > SCREEN_WIDTH - 1:
+            self.center_x = SCREEN_WIDTH - 1 - self.width / 2
+        elif self.center_y + self.height / 2 > SCREEN_HEIGHT - 1:
+            self.center_y = SCREEN_HEIGHT - 1 - self.height / 2
+        elif self.center_y - self.height / 2 < 0:
+            self.center_y = self.height / 2
+
+        self.player_score += SCORE_PER_SECOND * delta_time
+
+
+class ObstacleStore:
+    """
+    obstacles to dodge, kept as one NumPy array per field so all of them
+    are updated in a few batched operations per tick.
+
+    Live obstacles are packed into the first len(store) slots, a removed
+    obstacle's slot is filled with the last one. ids tells renderers when
+    a slot starts holding a different obstacle.
+
+    Slots are also kept in a SpatialHash, so collision checks only test
+    obstacles close to the player.
+    """
+
+    FIELDS = (
+        ("ids", np.int64),
+        ("type", np.int8),
+        ("scale", np.float64),
+        ("width", np.float64),
+        ("height", np.float64),
+        ("radius", np.float64),
+        ("center_x", np.float64),
+        ("center_y", np.float64),
+        ("change_x", np.float64),
+        ("change_y", np.float64),
+        ("speed_x", np.float64),
+        ("speed_y", np.float64),
+        # where the obstacle was before the last tick, swept collisions test the path from there
+        ("previous_x", np.float64),
+        ("previous_y", np.float64),
+        # only drawn, never simulated with, so single precision is enough
+        ("angle", np.float32),
+        ("change_angle", np.float32),
+        ("previous_angle", np.float32),
+        ("alpha", np.float32),
+        ("harmless_until", np.float64),
+        ("is_harmless", np.bool_),
+        ("cell", np.int64),
+    )
+
+    def __init__(self, rng=None, capacity=OBSTACLE_AMOUNT, definitions=DEFINITIONS):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.count = 0
+        self.next_id = 0
+        # seconds simulated, harmless_until is measured in it
+        self.time = 0
+
+        for name, dtype in self.FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype))
+
+        # per type lookup tables, see definitions.py
+        self.definitions = definitions
+        types = definitions.type_ids.tolist()
+        self.type_graphics = definitions.graphics
+        self.type_width = np.zeros(len(types) + 1)
+        self.type_height = np.zeros(len(types) + 1)
+        for t in types:
+            self.type_width[t], self.type_height[t] = image_size(self.type_graphics[t])
+
+        # largest hit box any obstacle can get, see spawn
+        self.max_radius = max(
+            min(self.type_width[t], self.type_height[t]) * SPRITE_SCALING * definitions.scale_max[t] / 2
+            for t in types)
+        # furthest any obstacle moved along x or y in the last tick, see measure_step
+        self.max_step = 0
+        self.grid = SpatialHash(OBSTACLE_CELL_SIZE)
+
+    def __len__(self):
+        return self.count
+
+    def reserve(self, capacity):
+        if capacity <= len(self.ids):
+            return
+        capacity = max(capacity, 2 * len(self.ids))
+        for name, dtype in self.FIELDS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def clear(self):
+        self.count = 0
+        self.grid.clear()
+
+    def rebuild_grid(self):
+        """
+        Put all live slots back into the grid, after the arrays were filled from outside
+        """
+        self.grid.clear()
+        for slot, key in enumerate(self.cell[:self.count].tolist()):
+            self.grid.add(slot, key)
+        self.measure_step()
+
+    def measure_step(self):
+        """
+        Update max_step from where the obstacles were before the last tick
+        """
+        n = self.count
+        if n == 0:
+            self.max_step = 0
+            return
+        self.max_step = float(max(
+            np.abs(self.center_x[:n] - self.previous_x[:n]).max(),
+            np.abs(self.center_y[:n] - self.previous_y[:n]).max()))
+
+    def cell_keys(self, s):
+        """
+        Grid keys of the obstacles in slice s
+        """
+        return self.grid.keys(self.center_x[s], self.center_y[s])
+
+    def spawn(self, amount, spawn_on_edge=False, rng=None, level=1):
+        """
+        Add amount new obstacles, either anywhere on screen or on its edges.
+
+        Obstacles spawned anywhere are harmless until end_harmless is called
+        for them. Their types come from the spawn table of level. Random
+        values come from rng if given, the store's generator otherwise.
+        Returns the first id and one past the last id handed out.
+        """
+        if amount <= 0:
+            return self.next_id, self.next_id
+        return self.spawn_layout(
+            self.generate(amount, spawn_on_edge, rng if rng is not None else self.rng, level))
+
+    def generate(self, amount, spawn_on_edge, rng, level=1):
+        """
+        Layout of amount new obstacles on level, a dict of field arrays.
+
+        Only reads the per type tables, so layouts can be generated on
+        another thread while the store is in use.
+        """
+        layout = {"harmless": not spawn_on_edge}
+        definitions = self.definitions
+
+        type = definitions.spawn_types(level, amount, rng)
+        layout["type"] = type
+        scale = layout["scale"] = SPRITE_SCALING * definitions.spawn_scales(type, rng)
+        width = layout["width"] = self.type_width[type] * scale
+        height = layout["height"] = self.type_height[type] * scale
+        layout["radius"] = np.minimum(width, height) / 2
+
+        if spawn_on_edge:
+            x = rng.integers(0, SCREEN_WIDTH + 1, amount).astype(np.float64)
+            y = rng.integers(0, SCREEN_HEIGHT + 1, amount).astype(np.float64)
+            edge = rng.integers(0, 4, amount)
+            y[edge == 0] = SCREEN_HEIGHT  # Top edge
+            x[edge == 1] = SCREEN_WIDTH  # Right
+            x[edge == 2] = 0  # Left
+            y[edge == 3] = 0  # Bottom
+        else:
+            x = rng.integers(0, SCREEN_WIDTH + 1, amount).astype(np.float64)
+            y = rng.integers(0, SCREEN_HEIGHT + 1, amount).astype(np.float64)
+        layout["center_x"] = x
+        layout["center_y"] = y
+
+        direction = definitions.spawn_directions(type, rng)
+        layout["speed_x"] = direction[:, 0]
+        layout["speed_y"] = direction[:, 1]
+
+        layout["change_angle"] = rng.uniform(-2, 2, amount)
+        return layout
+
+    def prepare(self, amount, rng, level=1):
+        """
+        Layout of a new level's obstacles, to be spawned into the store once it is cleared.
+
+        Like generate, but the grid buckets of the obstacles are filled in
+        too, so spawning the layout doesn't add them to the grid one by one.
+        """
+        layout = self.generate(amount, False, rng, level)
+        cell = layout["cell"] = self.grid.keys(layout["center_x"], layout["center_y"])
+        buckets = layout["buckets"] = {}
+        for slot, key in enumerate(cell.tolist()):
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = {slot}
+            else:
+                bucket.add(slot)
+        return layout
+
+    def spawn_layout(self, layout):
+        """
+        Add the obstacles of a layout from generate or prepare, returns their first and end id
+        """
+        amount = len(layout["type"])
+        if amount == 0:
+            return self.next_id, self.next_id
+
+        start = self.count
+        end = start + amount
+        self.reserve(end)
+        s = slice(start, end)
+
+        first_id = self.next_id
+        self.ids[s] = np.arange(first_id, first_id + amount)
+        self.next_id += amount
+
+        for name in ("type", "scale", "width", "height", "radius", "center_x", "center_y",
+                     "speed_x", "speed_y", "change_angle"):
+            getattr(self, name)[s] = layout[name]
+
+        # obstacles start at rest and pick up their speed on the first update
+        self.change_x[s] = 0
+        self.change_y[s] = 0
+
+        self.angle[s] = 0
+
+        self.previous_x[s] = self.center_x[s]
+        self.previous_y[s] = self.center_y[s]
+        self.previous_angle[s] = 0
+
+        self.alpha[s] = OBSTACLE_HARMLESS_ALPHA
+
+        if layout["harmless"]:
+            self.harmless_until[s] = self.time + OBSTACLE_HARMLESS_TIME
+            self.is_harmless[s] = True
+        else:
+            self.harmless_until[s] = self.time
+            self.is_harmless[s] = False
+
+        if "buckets" in layout and start == 0 and not self.grid.buckets:
+            # prepared for an empty store
+            self.cell[s] = layout["cell"]
+            self.grid.buckets = layout["buckets"]
+        else:
+            self.cell[s] = self.cell_keys(s)
+            for slot, key in zip(range(start, end), self.cell[s].tolist()):
+                self.grid.add(slot, key)
+
+        self.count = end
+        return first_id, first_id + amount
+
+    def end_harmless(self, first_id, end_id):
+        """
+        Make the obstacles with ids from first_id up to end_id dangerous
+        """
+        n = self.count
+        ids = self.ids[:n]
+        self.is_harmless[:n][(ids >= first_id) & (ids < end_id)] = False
+
+    def on_update(self, delta_time):
+        n = self.count
+        center_x = self.center_x[:n]
+        center_y = self.center_y[:n]
+        half_width = self.width[:n] / 2
+        half_height = self.height[:n] / 2
+        self.time += delta_time
+
+        self.previous_x[:n] = center_x
+        self.previous_y[:n] = center_y
+        self.previous_angle[:n] = self.angle[:n]
+
+        # frames at MOVEMENT_FPS this update stands for
+        frames = delta_time * MOVEMENT_FPS
+
+        center_x += self.change_x[:n] * frames
+        center_y += self.change_y[:n] * frames
+
+        # only obstacles that crossed into another cell touch the grid
+        cell = self.cell[:n]
+        new_cell = self.cell_keys(slice(0, n))
+        moved = np.flatnonzero(new_cell != cell)
+        for slot, old_key, new_key in zip(moved.tolist(), cell[moved].tolist(), new_cell[moved].tolist()):
+            self.grid.move(slot, old_key, new_key)
+        cell[:] = new_cell
+
+        alive = ~((center_x - half_width > SCREEN_WIDTH) | (center_x + half_width < 0) |
+                  (center_y - half_height > SCREEN_HEIGHT) | (center_y + half_height < 0))
+
+        is_harmless = self.is_harmless[:n]
+        self.alpha[:n] = 255
+        if is_harmless.any():
+            # fade in as the end of being harmless comes closer
+            time_left = np.maximum(self.harmless_until[:n][is_harmless] - self.time, 1)
+            self.alpha[:n][is_harmless] = 255 / time_left
+
+        factor = np.where(is_harmless, OBSTACLE_HARMLESS_SPEED_FACTOR, 1)
+        np.multiply(self.speed_x[:n], factor, out=self.change_x[:n])
+        np.multiply(self.speed_y[:n], factor, out=self.change_y[:n])
+        self.angle[:n] += self.change_angle[:n] * factor * frames
+
+        if not alive.all():
+            self._remove(np.flatnonzero(~alive))
+
+        self.measure_step()
+
+    def _remove(self, slots):
+        """
+        Drop the obstacles in the given sorted slots, moving the last ones into the gaps
+        """
+        n = self.count
+        remaining = n - len(slots)
+
+        keep = np.ones(n, np.bool_)
+        keep[slots] = False
+        holes = slots[slots < remaining]
+        tail = remaining + np.flatnonzero(keep[remaining:])
+
+        grid = self.grid
+        cell = self.cell
+        for slot in slots.tolist():
+            grid.remove(slot, int(cell[slot]))
+        for hole, slot in zip(holes.tolist(), tail.tolist()):
+            key = int(cell[slot])
+            grid.remove(slot, key)
+            grid.add(hole, key)
+
+        for name, dtype in self.FIELDS:
+            array = getattr(self, name)
+            array[holes] = array[tail]
+        self.count = remaining
+
+    def interpolated(self, alpha):
+        """
+        Positions and angles a fraction alpha of the way from the previous tick to this one
+        """
+        n = self.count
+        previous_x = self.previous_x[:n]
+        previous_y = self.previous_y[:n]
+        previous_angle = self.previous_angle[:n]
+        return (
+            previous_x + (self.center_x[:n] - previous_x) * alpha,
+            previous_y + (self.center_y[:n] - previous_y) * alpha,
+            previous_angle + (self.angle[:n] - previous_angle) * alpha,
+        )
+
+    def colliding(self, x, y, radius, layer=0):
+        """
+        Slots of the live obstacles overlapping a circle
+        """
+        candidates = np.array(self.grid.query(x, y, radius + self.max_radius, layer), np.int64)
+        dx = self.center_x[candidates] - x
+        dy = self.center_y[candidates] - y
+        reach = self.radius[candidates] + radius
+        return candidates[dx * dx + dy * dy < reach * reach]
+
+    def colliding_swept(self, x0, y0, x1, y1, radius, layer=0):
+        """
+        Slots of the live obstacles a circle moving from x0, y0 to x1, y1 touched during the last tick.
+
+        Obstacles moved from their previous to their current position at
+        the same time, so the test is done on the motion of each obstacle
+        relative to the circle, a capsule, and doesn't depend on how long
+        the tick was.
+        """
+        # the grid holds where obstacles ended up, search the square around both ends
+        # of the circle's path widened by how far any obstacle moved
+        half_path = max(abs(x1 - x0), abs(y1 - y0)) / 2
+        reach = radius + self.max_radius + self.max_step + half_path
+        candidates = np.array(self.grid.query((x0 + x1) / 2, (y0 + y1) / 2, reach, layer), np.int64)
+
+        previous_x = self.previous_x[candidates]
+        previous_y = self.previous_y[candidates]
+        # where each obstacle was relative to the circle, and how that changed over the tick
+        start_x = previous_x - x0
+        start_y = previous_y - y0
+        move_x = self.center_x[candidates] - previous_x - (x1 - x0)
+        move_y = self.center_y[candidates] - previous_y - (y1 - y0)
+
+        # closest they got during the tick
+        length = move_x * move_x + move_y * move_y
+        t = np.clip(-(start_x * move_x + start_y * move_y) / np.maximum(length, 1e-12), 0, 1)
+        dx = start_x + move_x * t
+        dy = start_y + move_y * t
+        reach = self.radius[candidates] + radius
+        return candidates[dx * dx + dy * dy < reach * reach]
+
+
+class PowerUpState:
+    """
+    A power-up floating somewhere on screen
+    """
+
+    # kinds of power-ups, see pick_up
+    EXTRA_LIFE = "extra_life"
+    EXTRA_SCORE = "extra_score"
+
+    # no __dict__ per power-up
+    __slots__ = ("kind", "id", "center_x", "center_y", "radius", "despawn_timer")
+
+    def __init__(self, kind, id, center_x, center_y):
+        self.reset(kind, id, center_x, center_y)
+
+    def reset(self, kind, id, center_x, center_y):
+        """
+        Turn a picked up power-up into a new one, so they can be pooled
+        """
+        self.kind = kind
+        self.id = id
+        self.center_x = center_x
+        self.center_y = center_y
+        self.radius = POWERUP_RADIUS
+        # the Simulation's timer removing the power-up again
+        self.despawn_timer = None
+
+    @property
+    def alpha(self):
+        if self.despawn_timer is None:
+            return 255
+        time_left = self.despawn_timer.remaining
+
+        # powerup fades out when only half of its alive time is left
+        if time_left <= POWERUP_ALIVE_TIME / 2:
+            return max((255 / POWERUP_ALIVE_TIME) * (time_left * 2), 0)
+        return 255
+
+    def pick_up(self, player):
+        """
+        what to happen when powerup is picked up
+        """
+        if self.kind == PowerUpState.EXTRA_LIFE:
+            player.player_lives += 1
+        elif self.kind == PowerUpState.EXTRA_SCORE:
+            player.player_score += POWERUP_EXTRA_SCORE
+
+
+POWERUP_KINDS = (PowerUpState.EXTRA_LIFE, PowerUpState.EXTRA_SCORE)
+
+
+def collides(a, b):
+    """
+    Check if two entities overlap, using circles as hit boxes
+    """
+    return math.hypot(a.center_x - b.center_x, a.center_y - b.center_y) < a.radius + b.radius
+
+
+class Simulation:
+    """
+    One session of the game, from the first level until the player runs out of lives.
+
+    All randomness comes from one generator seeded with seed, so a session
+    can be reproduced from its seed and the inputs of every tick.
+
+    Everything that happens after a delay, like a dash ending or the next
+    level starting, is a timer calling one of the methods below TIMER_CALLBACKS
+    names. Nothing counts down per tick.
+    """
+
+    # methods timers call, with the number of int arguments they take
+    TIMER_CALLBACKS = (
+        ("next_level", 0),
+        ("spawn_next_powerup", 0),
+        ("despawn_powerup", 1),
+        ("end_harmless", 2),
+        ("end_damage", 0),
+        ("end_dash", 0),
+        ("end_dash_cooldown", 0),
+    )
+
+    def __init__(self, seed=None, obstacle_store=ObstacleStore, profiler=None, executor=None, obstacle_amount=None):
+        self.seed = seed if seed is not None else new_seed()
+        self.rng = np.random.default_rng(self.seed)
+
+        # prepares the next level's obstacles in the background if given, e.g. a ThreadPoolExecutor
+        self.executor = executor
+        # (level, obstacle amount, future) of the layout being prepared
+        self.next_layout = None
+
+        # times the phases of step, see profiler.py
+        self.profiler = profiler if profiler is not None else NullProfiler()
+
+        # seconds simulated so far
+        self.time = 0
+        self.timers = TimerWheel(TIMER_RESOLUTION)
+
+        self.player = PlayerState()
+
+        # called with the generator, anything with the ObstacleStore methods step uses
+        self.obstacles = obstacle_store(self.rng)
+        self.powerups = []
+        # power-ups don't move, so they are added to the grid once
+        self.powerup_grid = SpatialHash(POWERUP_CELL_SIZE)
+
+        # picked up power-ups, reused for the next ones spawned
+        self.powerup_pool = []
+        self.next_powerup_id = 0
+
+        # timer starting the next level
+        self.level_timer = None
+
+        self.current_level = 0
+        # obstacles on the first level, later levels add to it
+        self.number_of_obstacles = obstacle_amount if obstacle_amount is not None else OBSTACLE_AMOUNT
+
+        # events of the last step, e.g. to play sounds
+        self.picked_up = []
+        self.despawned = []
+        # (x, y) of the obstacles that hurt the player
+        self.impacts = []
+
+        self.tick = 0
+
+        self.new_level()
+        # first power-up on the first tick
+        self.timers.schedule(0, self.spawn_next_powerup)
+
+    @property
+    def game_over(self):
+        return self.player.player_lives < 1
+
+    @property
+    def level_time_left(self):
+        return self.level_timer.remaining
+
+    def new_level(self):
+
+        if self.level_timer is not None:
+            self.level_timer.cancel()
+        self.level_timer = self.timers.schedule(LEVEL_TIME, self.next_level)
+
+        self.number_of_obstacles += LEVEL_OBSTACLE_GROWTH * self.current_level
+        self.current_level += 1
+
+        layout = self.level_layout(self.current_level, self.number_of_obstacles)
+        self.obstacles.clear()
+        first_id, end_id = self.obstacles.spawn_layout(layout)
+        self.timers.schedule(OBSTACLE_HARMLESS_TIME, self.end_harmless, first_id, end_id)
+
+        if self.executor is not None:
+            level = self.current_level + 1
+            amount = self.number_of_obstacles + LEVEL_OBSTACLE_GROWTH * self.current_level
+            self.next_layout = (level, amount, self.executor.submit(self.prepare_level, level, amount))
+
+    def prepare_level(self, level, amount):
+        """
+        Obstacle layout of a level.
+
+        Every level has its own generator, so the layout is the same
+        whenever and on whatever thread it is made.
+        """
+        return self.obstacles.prepare(amount, np.random.default_rng((self.seed, level)), level)
+
+    def level_layout(self, level, amount):
+        """
+        The layout prepared in the background if it matches, a new one otherwise
+        """
+        if self.next_layout is not None:
+            prepared_level, prepared_amount, future = self.next_layout
+            self.next_layout = None
+            if prepared_level == level and prepared_amount == amount:
+                return future.result()
+        return self.prepare_level(level, amount)
+
+    def next_level(self):
+        with self.profiler.scope("new_level"):
+            self.new_level()
+
+    def end_harmless(self, first_id, end_id):
+        self.obstacles.end_harmless(first_id, end_id)
+
+    def end_damage(self):
+        self.player.is_taking_damage = False
+
+    def end_dash(self):
+        self.player.is_dashing = False
+        # the cooldown starts when the dash is over
+        self.timers.schedule(DASH_COOLDOWN, self.end_dash_cooldown)
+
+    def end_dash_cooldown(self):
+        self.player.can_dash = True
+
+    def spawn_next_powerup(self):
+        self.spawn_powerup(POWERUP_KINDS[self.rng.integers(0, len(POWERUP_KINDS))])
+        self.timers.schedule(POWERUP_SPAWN_TIME, self.spawn_next_powerup)
+
+    def despawn_powerup(self, powerup_id):
+        for powerup in self.powerups:
+            if powerup.id == powerup_id:
+                self.remove_powerup(powerup)
+                self.despawned.append(powerup)
+                return
+
+    def remove_powerup(self, powerup):
+        self.powerups.remove(powerup)
+        self.powerup_grid.remove(powerup, self.powerup_grid.key(powerup.center_x, powerup.center_y))
+
+    def spawn_powerup(self, kind):
+        center_x = int(self.rng.integers(0, SCREEN_WIDTH + 1))
+        center_y = int(self.rng.integers(0, SCREEN_HEIGHT + 1))
+        if self.powerup_pool:
+            powerup = self.powerup_pool.pop()
+            powerup.reset(kind, self.next_powerup_id, center_x, center_y)
+        else:
+            powerup = PowerUpState(kind, self.next_powerup_id, center_x, center_y)
+        self.next_powerup_id += 1
+
+        self.powerups.append(powerup)
+        self.powerup_grid.add(powerup, self.powerup_grid.key(powerup.center_x, powerup.center_y))
+        powerup.despawn_timer = self.timers.schedule(POWERUP_ALIVE_TIME, self.despawn_powerup, powerup.id)
+
+    def apply_inputs(self, inputs):
+        """
+        Set the players speed and heading from the keys pressed
+        """
+        player = self.player
+
+        player.change_x = 0
+        player.change_y = 0
+
+        # Move player with keyboard
+        if inputs.left and not inputs.right:
+            player.change_x = -PLAYER_SPEED_X
+
+        if inputs.right and not inputs.left:
+            player.change_x = PLAYER_SPEED_X
+
+        if inputs.up and not inputs.down:
+            player.change_y = PLAYER_SPEED_Y
+
+        if inputs.down and not inputs.up:
+            player.change_y = - PLAYER_SPEED_Y
+
+        if player.change_x > 0 and player.change_y == 0:
+            player.wanted_angle = -90
+
+        if player.change_x > 0 and player.change_y > 0:
+            player.wanted_angle = -45
+
+        if player.change_x == 0 and player.change_y > 0:
+            player.wanted_angle = 0
+
+        if player.change_x < 0 and player.change_y == 0:
+            player.wanted_angle = 90
+
+        if player.change_x == 0 and player.change_y < 0:
+            player.wanted_angle = 180
+
+        if player.change_x < 0 and player.change_y < 0:
+            player.wanted_angle = 225
+
+        if player.change_x < 0 and player.change_y > 0:
+            player.wanted_angle = 45
+
+        if player.change_x > 0 and player.change_y < 0:
+            player.wanted_angle = -135
+
+        # Move player with joystick if present
+        if inputs.joystick_x is not None:
+            player.change_x = round(inputs.joystick_x) * PLAYER_SPEED_X
+            player.change_y = round(inputs.joystick_y) * PLAYER_SPEED_Y * -1
+            if round(inputs.joystick_x) == 1:
+                player.angle = -90
+            elif round(inputs.joystick_x) == -1:
+                player.angle = 90
+            elif round(inputs.joystick_y) == 1:
+                player.angle = 180
+            elif round(inputs.joystick_y) == -1:
+                player.angle = 0
+
+    def step(self, delta_time, inputs):
+        """
+        Advance the game by delta_time seconds
+        """
+        self.begin_step(delta_time, inputs)
+        with self.profiler.scope("obstacles"):
+            self.obstacles.on_update(delta_time)
+        self.finish_step(delta_time)
+
+    def begin_step(self, delta_time, inputs):
+        """
+        The part of step before the obstacles move
+        """
+        profiler = self.profiler
+
+        # power-ups gone last step can be reused now the caller has seen them
+        self.powerup_pool.extend(self.picked_up)
+        self.picked_up.clear()
+        self.powerup_pool.extend(self.despawned)
+        self.despawned.clear()
+        self.impacts.clear()
+
+        self.time += delta_time
+        with profiler.scope("timers"):
+            self.timers.advance_to(round(self.time / TIMER_RESOLUTION))
+
+        # once out of lives only the levels and obstacles go on, e.g. for the host of a multiplayer game
+        if not self.game_over:
+            self.step_player(delta_time, inputs)
+
+        with profiler.scope("spawning"):
+            # add missing obstacles
+            self.obstacles.spawn(
+                self.number_of_obstacles - len(self.obstacles), spawn_on_edge=True, level=self.current_level)
+
+    def step_player(self, delta_time, inputs):
+        """
+        Dash, hits, picked up power-ups, movement and score of the player for one tick
+        """
+        player = self.player
+        profiler = self.profiler
+
+        if inputs.dash and player.dash():
+            self.timers.schedule(DASHING_TIME, self.end_dash)
+
+        with profiler.scope("collisions"):
+            if player.is_dashing is False:
+                if SWEPT_COLLISIONS:
+                    hits = self.obstacles.colliding_swept(
+                        player.previous_x, player.previous_y, player.center_x, player.center_y, player.radius)
+                else:
+                    hits = self.obstacles.colliding(player.center_x, player.center_y, player.radius)
+                if not self.obstacles.is_harmless[hits].all() and player.taking_damage():
+                    self.timers.schedule(TAKING_DAMAGE_TIME, self.end_damage)
+                    hits = hits[~self.obstacles.is_harmless[hits]]
+                    self.impacts.extend(zip(
+                        self.obstacles.center_x[hits].tolist(), self.obstacles.center_y[hits].tolist()))
+
+            for powerup in self.powerup_grid.query(
+                    player.center_x, player.center_y, player.radius + POWERUP_RADIUS):
+                if collides(player, powerup):
+                    powerup.pick_up(player)
+                    powerup.despawn_timer.cancel()
+                    self.remove_powerup(powerup)
+                    self.picked_up.append(powerup)
+
+        with profiler.scope("player"):
+            self.apply_inputs(inputs)
+
+            player.update(delta_time)
+
+    def finish_step(self, delta_time):
+        """
+        The part of step after the obstacles moved
+        """
+        self.tick += 1
+
+
+class RandomBot:
+    """
+    Scripted player for headless runs, holds a random direction for a while and dashes now and then
+    """
+
+    def __init__(self, hold_ticks=SIMULATION_RATE // 2, dash_chance=0.01, seed=None):
+        self.hold_ticks = hold_ticks
+        self.dash_chance = dash_chance
+        self.random = random.Random(seed)
+        self.inputs = Inputs()
+
+    def __call__(self, simulation):
+        if simulation.tick % self.hold_ticks == 0:
+            self.inputs = Inputs(
+                left=self.random.random() < 0.5,
+                right=self.random.random() < 0.5,
+                up=self.random.random() < 0.5,
+                down=self.random.random() < 0.5,
+            )
+        self.inputs.dash = self.random.random() < self.dash_chance
+        return self.inputs
+
+
+def run_headless(ticks, delta_time=SIMULATION_STEP, tick_rate=None, bot=None, seed=None, recorder=None,
+                 profiler=None):
+    """
+    Run a session without a window for at most ticks ticks.
+
+    The simulation runs as fast as it can unless tick_rate (ticks per second) is given.
+    Inputs are passed to recorder.record if a replay.ReplayRecorder is given.
+    If a profiler is given every tick counts as one of its frames.
+    Returns the finished Simulation.
+    """
+    simulation = Simulation(seed, profiler=profiler)
+
+    if bot is None:
+        bot = RandomBot(seed=simulation.seed)
+
+    start = time.perf_counter()
+
+    while simulation.tick < ticks and not simulation.game_over:
+        inputs = bot(simulation)
+        if recorder is not None:
+            inputs = recorder.record(inputs)
+        simulation.step(delta_time, inputs)
+        simulation.profiler.end_frame()
+
+        if tick_rate:
+            # sleep until the next tick is due
+            due = start + simulation.tick / tick_rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    return simulation
+
+
+def main():
+    """
+    Main method
+    """
+    parser = argparse.ArgumentParser(description="Run the game without a window")
+    parser.add_argument("--ticks", type=int, default=60 * SIMULATION_RATE, help="maximum number of ticks to simulate")
+    parser.add_argument("--dt", type=float, default=SIMULATION_STEP, help="simulated seconds per tick")
+    parser.add_argument("--tick-rate", type=float, default=None,
+                        help="ticks per second to run at, uncapped if left out")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the session, random if left out")
+    parser.add_argument("--record", metavar="FILE", default=None, help="save a replay of the session")
+    parser.add_argument("--profile", action="store_true", help="print tick time percentiles of every phase")
+    parser.add_argument("--profile-export", metavar="FILE", default=None,
+                        help="write the time of every phase in every tick to a CSV file")
+    args = parser.parse_args()
+
+    seed = args.seed if args.seed is not None else new_seed()
+    recorder = None
+    if args.record:
+        # imported here, replay.py builds on this module
+        from replay import ReplayRecorder
+        recorder = ReplayRecorder(args.record, seed, args.dt)
+
+    profiler = None
+    if args.profile or args.profile_export:
+        profiler = Profiler(window=args.ticks, export_path=args.profile_export)
+
+    start = time.perf_counter()
+    simulation = run_headless(args.ticks, args.dt, args.tick_rate, seed=seed, recorder=recorder, profiler=profiler)
+    elapsed = time.perf_counter() - start
+
+    if profiler is not None:
+        profiler.close()
+
+    if recorder is not None:
+        recorder.close()
+
+    print("seed: {}, ticks: {}, level: {}, score: {}, lives: {}".format(
+        simulation.seed, simulation.tick, simulation.current_level,
+        int(simulation.player.player_score) * 10, simulation.player.player_lives))
+    print("{:.0f} ticks per second".format(simulation.tick / elapsed))
+    if args.profile:
+        print(profiler.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Running the simulation on its own thread, apart from drawing.
+
+SimulationThread steps a Simulation SIMULATION_RATE times per second on
+a worker thread. After every tick it copies what the window draws into
+the back one of two FrameStates and swaps it to the front under a lock.
+The window copies the front FrameState into its own while holding the
+lock and draws from that copy, so it never sees a tick half done and a
+slow frame doesn't hold up collisions and input handling: the worker
+reads the latest inputs at every tick whatever the render rate is.
+
+Events the window reacts to, like impacts and picked up power-ups, are
+queued instead of copied, so none are lost when the window draws less
+often than the simulation ticks.
+"""
+
+import collections
+import threading
+import time
+
+import numpy as np
+
+from simulation import SIMULATION_RATE, SIMULATION_STEP, PlayerState
+
+# ticks the worker may fall behind before it lets the game slow down instead
+MAX_TICKS_BEHIND = 10
+
+
+def tick_events(simulation, was_dashing):
+    """
+    ("dash",), ("pick_up", kind) and ("impact", x, y) tuples for what happened in the last tick
+    """
+    events = []
+    if simulation.player.is_dashing and not was_dashing:
+        events.append(("dash",))
+    for powerup in simulation.picked_up:
+        events.append(("pick_up", powerup.kind))
+    for x, y in simulation.impacts:
+        events.append(("impact", x, y))
+    return events
+
+
+class ObstacleFrame:
+    """
+    A copy of the obstacles of an ObstacleStore, as much as drawing needs
+    """
+
+    FIELDS = (
+        "ids", "type", "width", "height", "center_x", "center_y", "angle",
+        "previous_x", "previous_y", "previous_angle", "alpha",
+    )
+
+    def __init__(self, type_width):
+        self.type_width = type_width
+        self.count = 0
+        for name in self.FIELDS:
+            setattr(self, name, np.zeros(0))
+
+    def __len__(self):
+        return self.count
+
+    def copy_from(self, store):
+        n = len(store)
+        for name in self.FIELDS:
+            source = getattr(store, name)
+            array = getattr(self, name)
+            if len(array) < n or array.dtype != source.dtype:
+                # room to grow, levels only get more obstacles
+                array = np.empty(max(n, 2 * len(array)), source.dtype)
+                setattr(self, name, array)
+            array[:n] = source[:n]
+        self.count = n
+
+    def interpolated(self, alpha):
+        """
+        Positions and angles a fraction alpha of the way from the previous tick to this one
+        """
+        n = self.count
+        previous_x = self.previous_x[:n]
+        previous_y = self.previous_y[:n]
+        previous_angle = self.previous_angle[:n]
+        return (
+            previous_x + (self.center_x[:n] - previous_x) * alpha,
+            previous_y + (self.center_y[:n] - previous_y) * alpha,
+            previous_angle + (self.angle[:n] - previous_angle) * alpha,
+        )
+
+
+class PowerUpFrame:
+    """
+    A copy of a PowerUpState
+    """
+
+    __slots__ = ("kind", "id", "center_x", "center_y", "alpha")
+
+    def __init__(self, state):
+        self.kind = state.kind
+        self.id = state.id
+        self.center_x = state.center_x
+        self.center_y = state.center_y
+        self.alpha = state.alpha
+
+
+class FrameState:
+    """
+    What the window draws of a Simulation after a tick, with the same attribute names
+    """
+
+    def __init__(self, simulation):
+        self.player = PlayerState()
+        self.obstacles = ObstacleFrame(simulation.obstacles.type_width)
+        self.powerups = []
+        self.current_level = 0
+        self.level_time_left = 0
+        self.game_over = False
+        self.tick = 0
+        # perf_counter time the tick was done, to interpolate towards the next one
+        self.published_at = 0
+        self.copy_from(simulation)
+
+    def copy_from(self, simulation, published_at=None):
+        """
+        Copy the state of simulation, or of another FrameState, published at perf_counter time published_at
+        """
+        player = simulation.player
+        for name in PlayerState.__slots__:
+            setattr(self.player, name, getattr(player, name))
+        self.obstacles.copy_from(simulation.obstacles)
+        self.powerups = [PowerUpFrame(state) for state in simulation.powerups]
+        self.current_level = simulation.current_level
+        self.level_time_left = simulation.level_time_left
+        self.game_over = simulation.game_over
+        self.tick = simulation.tick
+        self.published_at = published_at if published_at is not None else time.perf_counter()
+
+
+class SimulationThread:
+    """
+    Steps a Simulation on a worker thread and publishes a FrameState after every tick.
+
+    read_inputs is called on the worker before every tick and returns the
+    Inputs to step with. record, if given, is called with them before the
+    step, e.g. ReplayRecorder.record.
+    """
+
+    def __init__(self, simulation, read_inputs, record=None):
+        self.simulation = simulation
+        self.read_inputs = read_inputs
+        self.record = record
+
+        # the window reads front, the worker writes back, swapped under lock
+        self.lock = threading.Lock()
+        self.front = FrameState(simulation)
+        self.back = FrameState(simulation)
+
+        # tick_events since the window last looked
+        self.events = collections.deque()
+
+        # seconds the last ticks took on the worker, appended under lock, see recent_tick_costs
+        self.tick_costs = collections.deque(maxlen=SIMULATION_RATE)
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="simulation", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop after the current tick and wait for it
+        """
+        self.stopped.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def run(self):
+        simulation = self.simulation
+        due = time.perf_counter()
+        while not self.stopped.is_set() and not simulation.game_over:
+            start = time.perf_counter()
+            inputs = self.read_inputs()
+            if self.record is not None:
+                inputs = self.record(inputs)
+
+            was_dashing = simulation.player.is_dashing
+            simulation.step(SIMULATION_STEP, inputs)
+            self.events.extend(tick_events(simulation, was_dashing))
+
+            self.back.copy_from(simulation)
+            with self.lock:
+                self.front, self.back = self.back, self.front
+                self.tick_costs.append(time.perf_counter() - start)
+
+            due += SIMULATION_STEP
+            delay = due - time.perf_counter()
+            if delay > 0:
+                self.stopped.wait(delay)
+            elif delay < -MAX_TICKS_BEHIND * SIMULATION_STEP:
+                # can't keep up, let the game slow down instead of falling further behind
+                due = time.perf_counter()
+
+    def copy_latest(self, state):
+        """
+        Copy the newest FrameState into state, only holding up the worker for the copy
+        """
+        with self.lock:
+            state.copy_from(self.front, self.front.published_at)
+
+    def recent_tick_costs(self):
+        """
+        Seconds the last ticks took on the worker, copied while it can't append to them
+        """
+        with self.lock:
+            return list(self.tick_costs)
+
+    def take_events(self):
+        """
+        The events queued since the last call
+        """
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        return events
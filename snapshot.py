@@ -0,0 +1,281 @@
+"""
+Snapshots of the full game state, for rewinding and seeking in replays.
+
+A snapshot copies the simulation into a few flat NumPy arrays: one for
+the player and session values, one row per obstacle, power-up and
+pending timer, plus the seed and the state of the random generator. Restoring one
+and stepping on with the same inputs gives exactly the same game.
+"""
+
+import struct
+
+import numpy as np
+
+from simulation import SIMULATION_RATE, POWERUP_KINDS, ObstacleStore, PowerUpState, Simulation
+from timers import Timer
+
+# (attribute, type) of everything in a snapshot's values array
+PLAYER_FIELDS = (
+    ("center_x", float),
+    ("center_y", float),
+    ("change_x", float),
+    ("change_y", float),
+    ("angle", float),
+    ("previous_x", float),
+    ("previous_y", float),
+    ("previous_angle", float),
+    ("wanted_angle", float),
+    ("is_taking_damage", bool),
+    ("player_lives", int),
+    ("is_dashing", bool),
+    ("can_dash", bool),
+    ("player_score", float),
+)
+
+SIMULATION_FIELDS = (
+    ("tick", int),
+    ("time", float),
+    ("current_level", int),
+    ("number_of_obstacles", int),
+    ("next_powerup_id", int),
+)
+
+OBSTACLE_DTYPE = np.dtype(list(ObstacleStore.FIELDS))
+
+POWERUP_DTYPE = np.dtype([
+    ("kind", np.int8),
+    ("id", np.int64),
+    ("center_x", np.float64),
+    ("center_y", np.float64),
+])
+
+TIMER_CALLBACKS = [name for name, argument_count in Simulation.TIMER_CALLBACKS]
+TIMER_ARGUMENTS = 2
+
+TIMER_DTYPE = np.dtype([
+    ("tick", np.int64),
+    ("seq", np.int64),
+    # index into TIMER_CALLBACKS
+    ("callback", np.int8),
+    ("args", np.int64, TIMER_ARGUMENTS),
+])
+
+MAGIC = b"MGSS"
+VERSION = 6
+
+# magic, version, number of values, obstacles, power-ups and timers
+HEADER = struct.Struct("<4sBIIII")
+# the session's seed, which the level layouts are generated from
+SEED = struct.Struct("<Q")
+# PCG64 state and increment as two 64 bit halves each, has_uint32, uinteger
+RNG_STATE = struct.Struct("<QQQQBI")
+
+MASK_64 = (1 << 64) - 1
+
+
+class Snapshot:
+    """
+    The state of a Simulation at one tick
+    """
+
+    def __init__(self, values, seed, rng_state, obstacles, powerups, timers):
+        # PLAYER_FIELDS followed by SIMULATION_FIELDS, the obstacle store's next
+        # id and time, and the timer wheel's tick and next sequence number
+        self.values = values
+        self.seed = seed
+        self.rng_state = rng_state
+        self.obstacles = obstacles
+        self.powerups = powerups
+        self.timers = timers
+
+    @property
+    def tick(self):
+        return int(self.values[len(PLAYER_FIELDS)])
+
+    @classmethod
+    def take(cls, simulation):
+        player = simulation.player
+        obstacles = simulation.obstacles
+
+        values = np.array(
+            [getattr(player, name) for name, kind in PLAYER_FIELDS] +
+            [getattr(simulation, name) for name, kind in SIMULATION_FIELDS] +
+            [obstacles.next_id, obstacles.time, simulation.timers.now, simulation.timers.next_seq],
+            np.float64)
+
+        n = len(obstacles)
+        obstacle_rows = np.empty(n, OBSTACLE_DTYPE)
+        for name, dtype in ObstacleStore.FIELDS:
+            obstacle_rows[name] = getattr(obstacles, name)[:n]
+
+        powerup_rows = np.empty(len(simulation.powerups), POWERUP_DTYPE)
+        for i, powerup in enumerate(simulation.powerups):
+            powerup_rows[i] = (POWERUP_KINDS.index(powerup.kind), powerup.id, powerup.center_x, powerup.center_y)
+
+        timers = list(simulation.timers.timers())
+        timer_rows = np.zeros(len(timers), TIMER_DTYPE)
+        for i, timer in enumerate(timers):
+            args = list(timer.args) + [0] * (TIMER_ARGUMENTS - len(timer.args))
+            timer_rows[i] = (timer.tick, timer.seq, TIMER_CALLBACKS.index(timer.callback.__name__), args)
+
+        rng_state = simulation.rng.bit_generator.state
+        rng_state = (
+            rng_state["state"]["state"], rng_state["state"]["inc"], rng_state["has_uint32"], rng_state["uinteger"])
+
+        return cls(values, simulation.seed, rng_state, obstacle_rows, powerup_rows, timer_rows)
+
+    def restore(self, simulation):
+        """
+        Put the simulation back into this state
+        """
+        player = simulation.player
+        obstacles = simulation.obstacles
+
+        values = self.values.tolist()
+        for (name, kind), value in zip(PLAYER_FIELDS, values):
+            setattr(player, name, kind(value))
+        values = values[len(PLAYER_FIELDS):]
+        for (name, kind), value in zip(SIMULATION_FIELDS, values):
+            setattr(simulation, name, kind(value))
+        next_id, obstacle_time, timer_tick, timer_seq = values[len(SIMULATION_FIELDS):]
+        obstacles.next_id = int(next_id)
+        obstacles.time = obstacle_time
+
+        n = len(self.obstacles)
+        obstacles.reserve(n)
+        for name, dtype in ObstacleStore.FIELDS:
+            getattr(obstacles, name)[:n] = self.obstacles[name]
+        obstacles.count = n
+        obstacles.rebuild_grid()
+
+        # reuse the power-up objects the simulation already has
+        simulation.powerup_pool.extend(simulation.powerups)
+        simulation.powerup_pool.extend(simulation.picked_up)
+        simulation.powerup_pool.extend(simulation.despawned)
+        simulation.powerups = []
+        simulation.picked_up.clear()
+        simulation.despawned.clear()
+        simulation.impacts.clear()
+        simulation.powerup_grid.clear()
+        powerups = {}
+        for kind, id, center_x, center_y in self.powerups.tolist():
+            if simulation.powerup_pool:
+                powerup = simulation.powerup_pool.pop()
+                powerup.reset(POWERUP_KINDS[kind], id, center_x, center_y)
+            else:
+                powerup = PowerUpState(POWERUP_KINDS[kind], id, center_x, center_y)
+            powerups[id] = powerup
+            simulation.powerups.append(powerup)
+            simulation.powerup_grid.add(powerup, simulation.powerup_grid.key(center_x, center_y))
+
+        # timers call methods of the simulation, so they are made again from their names
+        wheel = simulation.timers
+        wheel.clear()
+        wheel.now = int(timer_tick)
+        wheel.next_seq = int(timer_seq)
+        argument_counts = dict(Simulation.TIMER_CALLBACKS)
+        for tick, seq, callback, args in self.timers.tolist():
+            name = TIMER_CALLBACKS[callback]
+            timer = Timer(wheel, tick, seq, getattr(simulation, name), tuple(args[:argument_counts[name]]))
+            wheel.insert(timer)
+            if name == "next_level":
+                simulation.level_timer = timer
+            elif name == "despawn_powerup":
+                powerups[timer.args[0]].despawn_timer = timer
+
+        simulation.seed = self.seed
+        # a layout prepared in the background may be for another session
+        simulation.next_layout = None
+
+        state, inc, has_uint32, uinteger = self.rng_state
+        simulation.rng.bit_generator.state = {
+            "bit_generator": "PCG64",
+            "state": {"state": state, "inc": inc},
+            "has_uint32": has_uint32,
+            "uinteger": uinteger,
+        }
+
+    def to_bytes(self):
+        state, inc, has_uint32, uinteger = self.rng_state
+        return b"".join((
+            HEADER.pack(MAGIC, VERSION, len(self.values), len(self.obstacles), len(self.powerups), len(self.timers)),
+            SEED.pack(self.seed),
+            RNG_STATE.pack(state >> 64, state & MASK_64, inc >> 64, inc & MASK_64, has_uint32, uinteger),
+            self.values.tobytes(),
+            self.obstacles.tobytes(),
+            self.powerups.tobytes(),
+            self.timers.tobytes(),
+        ))
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, value_count, obstacle_count, powerup_count, timer_count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a version {} snapshot".format(VERSION))
+        offset = HEADER.size
+
+        seed, = SEED.unpack_from(data, offset)
+        offset += SEED.size
+
+        state_high, state_low, inc_high, inc_low, has_uint32, uinteger = RNG_STATE.unpack_from(data, offset)
+        rng_state = ((state_high << 64) | state_low, (inc_high << 64) | inc_low, has_uint32, uinteger)
+        offset += RNG_STATE.size
+
+        values = np.frombuffer(data, np.float64, value_count, offset).copy()
+        offset += values.nbytes
+        obstacles = np.frombuffer(data, OBSTACLE_DTYPE, obstacle_count, offset).copy()
+        offset += obstacles.nbytes
+        powerups = np.frombuffer(data, POWERUP_DTYPE, powerup_count, offset).copy()
+        offset += powerups.nbytes
+        timers = np.frombuffer(data, TIMER_DTYPE, timer_count, offset).copy()
+
+        return cls(values, seed, rng_state, obstacles, powerups, timers)
+
+
+class Keyframes:
+    """
+    Ring buffer of snapshots taken every interval ticks.
+
+    Seeking to a tick restores the closest keyframe before it and simulates
+    the few ticks from there.
+    """
+
+    def __init__(self, interval=SIMULATION_RATE, capacity=120):
+        self.interval = interval
+        self.capacity = capacity
+        self.snapshots = [None] * capacity
+
+    def record(self, simulation):
+        """
+        Call after every step, takes a snapshot when one is due
+        """
+        if simulation.tick % self.interval == 0:
+            self.snapshots[(simulation.tick // self.interval) % self.capacity] = Snapshot.take(simulation)
+
+    def latest(self, tick):
+        """
+        The newest keyframe at or before tick, or None if it already left the buffer
+        """
+        snapshot = self.snapshots[(tick // self.interval) % self.capacity]
+        if snapshot is not None and snapshot.tick == tick - tick % self.interval:
+            return snapshot
+        return None
+
+    def seek(self, simulation, tick, inputs, delta_time):
+        """
+        Bring simulation to tick, inputs[t] being the inputs of tick t.
+
+        Returns False if tick is behind the simulation and there is no keyframe to start from.
+        """
+        snapshot = self.latest(tick)
+
+        # keep going from where we are unless the keyframe is closer or we are past tick
+        if snapshot is not None and (snapshot.tick > simulation.tick or simulation.tick > tick):
+            snapshot.restore(simulation)
+        elif simulation.tick > tick:
+            return False
+
+        while simulation.tick < tick:
+            simulation.step(delta_time, inputs[simulation.tick])
+            self.record(simulation)
+        return True
@@ -0,0 +1,113 @@
+"""
+Sound effects, decoded in the background and played from a bounded pool of voices.
+
+Decoding starts on a background thread at startup, so the window opens
+without waiting for it. A sound asked for before it is decoded is
+skipped, never waited for. At most MAX_VOICES sounds play at once. When
+all voices are busy a new sound takes the voice of the oldest one, or is
+dropped if that one just started, so a burst of effects can't pile up
+players or stall the game loop.
+"""
+
+import threading
+import time
+
+import arcade
+import pyglet
+
+# sounds playing at the same time
+MAX_VOICES = 8
+# a voice younger than this many seconds isn't stolen, the new sound is dropped instead
+MIN_VOICE_AGE = 0.05
+
+
+class Voice:
+    """
+    A sound being played
+    """
+
+    __slots__ = ("sound", "player", "start")
+
+    def __init__(self, sound, player, start):
+        self.sound = sound
+        self.player = player
+        self.start = start
+
+
+class SoundManager:
+    """
+    Decodes sounds on a background thread and plays them on a limited number of voices
+    """
+
+    def __init__(self, paths, max_voices=MAX_VOICES):
+        self.paths = list(paths)
+        self.max_voices = max_voices
+        # decoded sounds by path, filled in by the loader thread
+        self.sounds = {}
+        # seconds it took to decode each sound
+        self.load_times = {}
+        self.voices = []
+        # sounds skipped because they weren't decoded yet or no voice was free
+        self.dropped = 0
+        self.stolen = 0
+        self.thread = None
+
+    def start(self):
+        """
+        Start decoding all sounds in the background
+        """
+        # opening the audio device is slow on some systems, do it now rather than on the first sound
+        pyglet.media.get_audio_driver()
+        self.thread = threading.Thread(target=self.load, name="sound loader", daemon=True)
+        self.thread.start()
+
+    def load(self):
+        for path in self.paths:
+            start = time.perf_counter()
+            sound = arcade.load_sound(path)
+            self.load_times[path] = time.perf_counter() - start
+            # a single assignment, so the game thread never sees a half loaded sound
+            self.sounds[path] = sound
+
+    @property
+    def loaded(self):
+        return len(self.sounds) == len(self.paths)
+
+    def wait(self, timeout=None):
+        """
+        Block until all sounds are decoded, for tools that need them right away
+        """
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def play(self, path, volume=1.0):
+        """
+        Play a sound if it is decoded and a voice is free, returns whether it plays
+        """
+        sound = self.sounds.get(path)
+        if sound is None:
+            self.dropped += 1
+            return False
+
+        now = time.perf_counter()
+        voices = self.voices
+        # free the voices of sounds that have ended
+        voices[:] = [
+            voice for voice in voices if voice.player.playing and not voice.sound.is_complete(voice.player)]
+
+        if len(voices) >= self.max_voices:
+            oldest = voices[0]
+            if now - oldest.start < MIN_VOICE_AGE:
+                self.dropped += 1
+                return False
+            oldest.sound.stop(oldest.player)
+            del voices[0]
+            self.stolen += 1
+
+        voices.append(Voice(sound, sound.play(volume), now))
+        return True
+
+    def stop_all(self):
+        for voice in self.voices:
+            voice.sound.stop(voice.player)
+        self.voices.clear()
@@ -0,0 +1,52 @@
+import numpy as np
+
+from simulation import SIMULATION_STEP, ObstacleStore, RandomBot, Simulation
+
+RADIUS = 20
+
+
+def brute_force_hits(store, x0, y0, x1, y1, radius, samples=201):
+    """
+    Slots of the obstacles a circle moving from x0, y0 to x1, y1 touched, sampled along the tick
+    """
+    n = len(store)
+    hits = set()
+    for t in np.linspace(0, 1, samples):
+        x = x0 + (x1 - x0) * t
+        y = y0 + (y1 - y0) * t
+        obstacle_x = store.previous_x[:n] + (store.center_x[:n] - store.previous_x[:n]) * t
+        obstacle_y = store.previous_y[:n] + (store.center_y[:n] - store.previous_y[:n]) * t
+        # a hair inside, sampling can't tell touching apart from nearly touching
+        close = np.hypot(obstacle_x - x, obstacle_y - y) < store.radius[:n] + radius - 0.01
+        hits.update(np.flatnonzero(close).tolist())
+    return hits
+
+
+def test_swept_collisions_find_everything_brute_force_does():
+    simulation = Simulation(5)
+    simulation.player.player_lives = 10 ** 9
+    bot = RandomBot(seed=5)
+    rng = np.random.default_rng(0)
+    for tick in range(600):
+        simulation.step(SIMULATION_STEP, bot(simulation))
+        store = simulation.obstacles
+        x0, y0 = rng.uniform(0, 1000, 2)
+        x1, y1 = x0 + rng.uniform(-60, 60), y0 + rng.uniform(-60, 60)
+
+        swept = set(store.colliding_swept(x0, y0, x1, y1, RADIUS).tolist())
+        assert set(store.colliding(x1, y1, RADIUS).tolist()) <= swept
+        assert brute_force_hits(store, x0, y0, x1, y1, RADIUS) <= swept
+
+
+def test_nothing_passes_through_the_player_between_ticks():
+    store = ObstacleStore(capacity=1)
+    store.spawn(1, True, np.random.default_rng(1))
+    store.previous_x[0] = store.center_x[0] = 100
+    store.previous_y[0] = store.center_y[0] = 500
+    store.radius[0] = 5
+    store.cell[0] = store.cell_keys(slice(0, 1))[0]
+    store.rebuild_grid()
+
+    # the player jumps over the obstacle within one tick
+    assert len(store.colliding(200, 500, 5)) == 0
+    assert store.colliding_swept(0, 500, 200, 500, 5).tolist() == [0]
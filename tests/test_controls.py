@@ -0,0 +1,37 @@
+from controls import DASH, LEFT, RIGHT, InputBuffer, InputState
+
+
+def test_events_are_read_by_the_tick_they_happened_in():
+    buffer = InputBuffer()
+    state = InputState()
+    buffer.press(LEFT, 1.0)
+    buffer.release(LEFT, 1.5)
+    buffer.press(RIGHT, 2.5)
+
+    # a key tapped within a tick still counts for it
+    inputs = state.inputs(buffer, 2.0)
+    assert inputs.left and not inputs.right
+    inputs = state.inputs(buffer, 3.0)
+    assert inputs.right and not inputs.left
+
+
+def test_key_repeats_are_filtered_and_dash_is_one_press():
+    buffer = InputBuffer()
+    state = InputState()
+    buffer.press(DASH, 1.0)
+    buffer.press(DASH, 1.1)
+    assert len(buffer) == 1
+    assert state.inputs(buffer, 2.0).dash
+    assert not state.inputs(buffer, 3.0).dash
+
+
+def test_presses_dropped_by_a_full_buffer_are_not_remembered():
+    buffer = InputBuffer(capacity=1)
+    buffer.press(LEFT, 1.0)
+    buffer.press(RIGHT, 1.0)
+    assert buffer.dropped == 1
+
+    InputState().inputs(buffer, 2.0)
+    # not a repeat, the first press never made it
+    buffer.press(RIGHT, 2.5)
+    assert len(buffer) == 1
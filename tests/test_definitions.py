@@ -0,0 +1,36 @@
+import json
+
+import numpy as np
+import pytest
+
+from definitions import DEFINITIONS_PATH, MAX_SCALE, ObstacleDefinitions
+
+
+def definitions():
+    with open(DEFINITIONS_PATH) as f:
+        return json.load(f)
+
+
+def test_spawned_obstacles_follow_the_tables():
+    compiled = ObstacleDefinitions(definitions())
+    rng = np.random.default_rng(1)
+    types = compiled.spawn_types(1, 1000, rng)
+    assert set(types.tolist()) <= set(compiled.type_ids.tolist())
+
+    scales = compiled.spawn_scales(types, rng)
+    assert np.all(scales >= compiled.scale_min[types]) and np.all(scales <= compiled.scale_max[types])
+
+
+@pytest.mark.parametrize("scale", [[1.5, 3], [3, 2], [0, 2], [1, MAX_SCALE + 1]])
+def test_bad_scale_ranges_are_rejected_on_load(scale):
+    broken = definitions()
+    next(iter(broken["types"].values()))["scale"] = scale
+    with pytest.raises(ValueError):
+        ObstacleDefinitions(broken)
+
+
+def test_unknown_types_in_spawn_tables_are_rejected_on_load():
+    broken = definitions()
+    broken["levels"]["spawn_tables"][0]["weights"]["no_such_type"] = 1
+    with pytest.raises(ValueError):
+        ObstacleDefinitions(broken)
@@ -0,0 +1,86 @@
+import random
+
+import numpy as np
+import pytest
+
+from multiplayer import (
+    POSITION_SCALE, GameClient, GameServer, decode_obstacles, encode_obstacles, quantise_obstacles,
+)
+from simulation import SIMULATION_STEP, RandomBot, Simulation
+
+
+def test_deltas_decode_to_the_current_obstacles():
+    simulation = Simulation(3)
+    simulation.player.player_lives = 10 ** 9
+    bot = RandomBot(seed=3)
+    baseline = quantise_obstacles(simulation.obstacles)
+    # far enough apart for obstacles to leave, appear and move too far for a delta
+    for tick in range(240):
+        simulation.step(SIMULATION_STEP, bot(simulation))
+        if tick % 20 == 19:
+            current = quantise_obstacles(simulation.obstacles)
+            assert np.array_equal(decode_obstacles(baseline, *encode_obstacles(current, baseline)), current)
+            assert np.array_equal(decode_obstacles(None, *encode_obstacles(current, None)), current)
+            baseline = current
+
+
+def test_clients_rebuild_the_servers_obstacles_despite_lost_messages():
+    server = GameServer(2, seed=5, obstacles=500)
+    clients = [GameClient(RandomBot(seed=i)) for i in range(2)]
+    loss = random.Random(1)
+    for i, client in enumerate(clients):
+        server.add_peer(i, lambda data, client=client: client.receive(data) if loss.random() > 0.3 else None)
+
+    checked = 0
+    for tick in range(600):
+        for i, client in enumerate(clients):
+            if tick % 2 == 0 and loss.random() > 0.3:
+                server.receive(server.peers[i], client.input_message(client.bot(client)))
+        server.step()
+        for client in clients:
+            if client.tick in server.history:
+                assert np.array_equal(server.history[client.tick], client.obstacles)
+                checked += 1
+    assert checked > 0
+
+
+def test_every_player_starts_on_level_1_with_the_obstacles_asked_for():
+    server = GameServer(3, seed=5, obstacles=321)
+    assert [simulation.current_level for simulation in server.simulations] == [1, 1, 1]
+    assert len(server.simulations[0].obstacles) == 321
+
+
+def test_a_host_out_of_lives_only_keeps_the_obstacles_going():
+    server = GameServer(2, seed=5)
+    host = server.simulations[0]
+    host.player.player_lives = 0
+    score = host.player.player_score
+
+    for tick in range(600):
+        server.step()
+    assert host.player.player_score == score
+    assert host.player.player_lives == 0
+    assert host.picked_up == []
+    assert host.obstacles.time > 0
+
+
+def test_clients_interpolate_between_the_last_two_snapshots():
+    server = GameServer(1, seed=2)
+    client = GameClient()
+    server.add_peer(0, client.receive)
+    for tick in range(2 * server.snapshot_interval):
+        server.step()
+
+    ids, types, x, y, angle, alpha, width, height = client.interpolated_obstacles(1)
+    assert np.array_equal(x, client.obstacles["x"] / POSITION_SCALE)
+    assert np.all(width > 0) and np.all(height > 0)
+
+    previous = client.previous_obstacles
+    known = np.isin(client.obstacles["id"], previous["id"])
+    x, y = client.interpolated_obstacles(0)[2:4]
+    assert np.array_equal(x[known], previous["x"][np.isin(previous["id"], client.obstacles["id"])] / POSITION_SCALE)
+
+    assert client.interval == server.snapshot_interval * SIMULATION_STEP
+    assert client.alpha(client.received_at) == 0
+    assert client.alpha(client.received_at + client.interval / 2) == pytest.approx(0.5)
+    assert client.alpha(client.received_at + 2 * client.interval) == 1
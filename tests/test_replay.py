@@ -0,0 +1,23 @@
+from replay import Replay, ReplayRecorder, pack_inputs, unpack_inputs
+from simulation import Inputs, run_headless
+
+
+def test_inputs_survive_packing():
+    inputs = Inputs(left=True, down=True, dash=True, joystick_x=0.5, joystick_y=-1)
+    unpacked = unpack_inputs(*pack_inputs(inputs))
+    assert (unpacked.left, unpacked.right, unpacked.up, unpacked.down, unpacked.dash) == (True, False, False, True, True)
+    assert abs(unpacked.joystick_x - 0.5) < 1 / 127
+    assert unpacked.joystick_y == -1
+
+
+def test_a_recorded_session_plays_back_the_same(tmp_path):
+    path = str(tmp_path / "session.replay")
+    recorder = ReplayRecorder(path, 11)
+    recorded = run_headless(5000, seed=11, recorder=recorder)
+    recorder.close()
+
+    played = Replay.load(path).play()
+    assert played.tick == recorded.tick
+    assert played.current_level == recorded.current_level
+    assert played.player.player_score == recorded.player.player_score
+    assert played.player.player_lives == recorded.player.player_lives
@@ -0,0 +1,62 @@
+from simulation import SIMULATION_STEP, Inputs, RandomBot, Simulation
+from snapshot import Keyframes, Snapshot
+
+
+def state(simulation):
+    """
+    A snapshot of simulation as bytes, with the timers in a fixed order
+    """
+    snapshot = Snapshot.take(simulation)
+    snapshot.timers.sort(order=("tick", "seq"))
+    return snapshot.to_bytes()
+
+
+def play(ticks, seed=7):
+    """
+    A session that can't end, its inputs and keyframes
+    """
+    simulation = Simulation(seed)
+    simulation.player.player_lives = 10 ** 6
+    bot = RandomBot(seed=1)
+    keyframes = Keyframes()
+    inputs = []
+    for tick in range(ticks):
+        bot_inputs = bot(simulation)
+        inputs.append(Inputs(bot_inputs.left, bot_inputs.right, bot_inputs.up, bot_inputs.down, bot_inputs.dash))
+        simulation.step(SIMULATION_STEP, inputs[-1])
+        keyframes.record(simulation)
+    return simulation, inputs, keyframes
+
+
+def test_restored_snapshot_plays_on_the_same():
+    simulation, inputs, keyframes = play(2000)
+    restored = Simulation(99)
+    Snapshot.from_bytes(Snapshot.take(simulation).to_bytes()).restore(restored)
+
+    more = [Inputs(up=True, dash=tick % 50 == 0) for tick in range(2000)]
+    for tick_inputs in more:
+        simulation.step(SIMULATION_STEP, tick_inputs)
+    for tick_inputs in more:
+        restored.step(SIMULATION_STEP, tick_inputs)
+
+    assert restored.current_level > 1
+    assert state(restored) == state(simulation)
+
+
+def test_seeking_back_and_forth_gives_the_same_state():
+    simulation, inputs, keyframes = play(3000)
+    end = state(simulation)
+
+    assert keyframes.seek(simulation, 1234, inputs, SIMULATION_STEP)
+    assert simulation.tick == 1234
+    assert keyframes.seek(simulation, 3000, inputs, SIMULATION_STEP)
+    assert state(simulation) == end
+
+
+def test_seeking_behind_the_keyframes_fails():
+    simulation, inputs, keyframes = play(600)
+    # only room for the keyframe of the last second
+    keyframes = Keyframes(capacity=1)
+    keyframes.record(simulation)
+    assert not keyframes.seek(simulation, 10, inputs, SIMULATION_STEP)
+    assert simulation.tick == 600
@@ -0,0 +1,40 @@
+from timers import WHEEL_SIZE, TimerWheel
+
+
+def test_timers_fire_on_their_tick_in_scheduling_order():
+    wheel = TimerWheel(0.5)
+    fired = []
+    wheel.schedule(1, fired.append, "b")
+    wheel.schedule(0.5, fired.append, "a")
+    wheel.schedule(1, fired.append, "c")
+
+    wheel.advance_to(1)
+    assert fired == ["a"]
+    wheel.advance_to(2)
+    assert fired == ["a", "b", "c"]
+
+
+def test_far_timers_move_down_the_levels_and_fire_on_time():
+    wheel = TimerWheel(1)
+    fired = []
+    delays = [WHEEL_SIZE - 1, WHEEL_SIZE, WHEEL_SIZE ** 2 + 3, WHEEL_SIZE ** 3 + 17]
+    for delay in delays:
+        wheel.schedule(delay, lambda delay=delay: fired.append((delay, wheel.now)))
+
+    wheel.advance_to(WHEEL_SIZE ** 3 + 17)
+    assert fired == [(delay, delay) for delay in delays]
+
+
+def test_cancelled_timers_dont_fire_and_remaining_counts_down():
+    wheel = TimerWheel(0.25)
+    fired = []
+    kept = wheel.schedule(2, fired.append, "kept")
+    cancelled = wheel.schedule(1, fired.append, "cancelled")
+    cancelled.cancel()
+
+    wheel.advance_to(4)
+    assert kept.remaining == 1
+    assert list(wheel.timers()) == [kept]
+
+    wheel.advance_to(8)
+    assert fired == ["kept"]
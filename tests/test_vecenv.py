@@ -0,0 +1,33 @@
+import numpy as np
+
+from simulation import SIMULATION_STEP, Simulation
+from vecenv import VecEnv, action_inputs
+
+
+def test_envs_play_like_standalone_sessions():
+    num_envs = 4
+    env = VecEnv(num_envs, seed=3, max_ticks=10 ** 9)
+    env.reset()
+    standalone = [Simulation(simulation.seed) for simulation in env.simulations]
+    finished = np.zeros(num_envs, np.bool_)
+    rng = np.random.default_rng(0)
+
+    for step in range(300):
+        actions = rng.integers(-1, 2, (num_envs, 3))
+        actions[:, 2] = rng.random(num_envs) < 0.05
+        stepped = list(env.simulations)
+        observations, rewards, dones, info = env.step(actions)
+
+        for i in np.flatnonzero(~finished).tolist():
+            inputs = action_inputs(actions[i])
+            reference = standalone[i]
+            for tick in range(env.action_repeat):
+                if reference.game_over:
+                    break
+                reference.step(SIMULATION_STEP, inputs)
+                inputs.dash = False
+            player = stepped[i].player
+            assert (stepped[i].tick, player.player_score, player.player_lives, player.center_x) == (
+                reference.tick, reference.player.player_score, reference.player.player_lives,
+                reference.player.center_x)
+        finished |= dones
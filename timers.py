@@ -0,0 +1,125 @@
+"""
+Hierarchical timer wheel for the simulation.
+
+Timers are sorted into buckets by the tick they expire on, so advancing
+the wheel only touches the timers that are due, however many are
+waiting. Each level of the wheel has WHEEL_SIZE buckets spanning
+WHEEL_SIZE times as many ticks as the level below it. Timers far in the
+future wait on a higher level and move down when their tick comes close.
+"""
+
+import math
+
+WHEEL_BITS = 6
+WHEEL_SIZE = 1 << WHEEL_BITS
+WHEEL_MASK = WHEEL_SIZE - 1
+WHEEL_LEVELS = 4
+
+
+class Timer:
+    """
+    A callback waiting for its tick, returned by TimerWheel.schedule
+    """
+
+    __slots__ = ("wheel", "tick", "seq", "callback", "args", "cancelled")
+
+    def __init__(self, wheel, tick, seq, callback, args):
+        self.wheel = wheel
+        self.tick = tick
+        # timers due on the same tick fire in the order they were scheduled
+        self.seq = seq
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    @property
+    def remaining(self):
+        """
+        Seconds until the timer fires
+        """
+        return (self.tick - self.wheel.now) * self.wheel.resolution
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Runs callbacks after a delay, counted in ticks of resolution seconds
+    """
+
+    def __init__(self, resolution):
+        self.resolution = resolution
+        self.now = 0
+        self.next_seq = 0
+        self.levels = [[[] for i in range(WHEEL_SIZE)] for level in range(WHEEL_LEVELS)]
+
+    def schedule(self, delay, callback, *args):
+        """
+        Call callback(*args) delay seconds from now, on the next tick at the earliest
+        """
+        ticks = max(1, math.ceil(delay / self.resolution - 1e-9))
+        timer = Timer(self, self.now + ticks, self.next_seq, callback, args)
+        self.next_seq += 1
+        self.insert(timer)
+        return timer
+
+    def insert(self, timer):
+        """
+        Put a timer into the bucket for its tick
+        """
+        ticks = timer.tick - self.now
+        for level in range(WHEEL_LEVELS):
+            if ticks < 1 << (WHEEL_BITS * (level + 1)):
+                self.levels[level][(timer.tick >> (WHEEL_BITS * level)) & WHEEL_MASK].append(timer)
+                return
+        raise ValueError("can't schedule a timer {} ticks ahead".format(ticks))
+
+    def timers(self):
+        """
+        All timers still waiting, in no particular order
+        """
+        for level in self.levels:
+            for bucket in level:
+                for timer in bucket:
+                    if not timer.cancelled:
+                        yield timer
+
+    def clear(self):
+        for level in self.levels:
+            for bucket in level:
+                bucket.clear()
+
+    def advance_to(self, tick):
+        """
+        Move the wheel forward to tick, firing every timer due on the way
+        """
+        levels = self.levels
+        while self.now < tick:
+            self.now += 1
+            now = self.now
+
+            # a level wraps around every WHEEL_SIZE ** level ticks, then the
+            # timers in the current bucket of the level above it move down
+            wrapped = 0
+            for level in range(1, WHEEL_LEVELS):
+                if now & ((1 << (WHEEL_BITS * level)) - 1):
+                    break
+                wrapped = level
+            for level in range(wrapped, 0, -1):
+                index = (now >> (WHEEL_BITS * level)) & WHEEL_MASK
+                bucket = levels[level][index]
+                levels[level][index] = []
+                for timer in bucket:
+                    if not timer.cancelled:
+                        self.insert(timer)
+
+            index = now & WHEEL_MASK
+            due = levels[0][index]
+            if not due:
+                continue
+            levels[0][index] = []
+            due.sort(key=lambda timer: timer.seq)
+            for timer in due:
+                if not timer.cancelled:
+                    timer.callback(*timer.args)
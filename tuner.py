@@ -0,0 +1,153 @@
+"""
+Monte Carlo tuning of the difficulty constants.
+
+Plays many headless sessions with RandomBot for every combination of the
+given constants and prints how long the bot survived, which level it
+reached and what it scored. Sessions are spread over all cores with a
+process pool. Every parameter set plays the same seeds, so differences
+between them come from the constants and not from luck.
+
+    python tuner.py --sessions 1000 --set OBSTACLE_AMOUNT=30,50,80 --set LEVEL_TIME=10,15
+
+"""
+
+import argparse
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import simulation
+from simulation import SIMULATION_RATE, SIMULATION_STEP, run_headless
+
+# constants of simulation.py that can be changed with --set
+TUNABLE = (
+    "OBSTACLE_AMOUNT",
+    "LEVEL_TIME",
+    "DASH_COOLDOWN",
+    "OBSTACLE_HARMLESS_TIME",
+)
+
+# sessions handed to a worker at once, so the pool isn't busy sending single results around
+BATCH_SIZE = 25
+
+
+def play_sessions(params, seeds, ticks):
+    """
+    Play one session per seed with the constants in params.
+
+    Runs inside a worker process, which has its own copy of the simulation
+    module, so the constants are changed there and put back afterwards.
+    Returns (params, results) with a (seconds survived, level, score) tuple per session.
+    """
+    defaults = {name: getattr(simulation, name) for name in params}
+    for name, value in params.items():
+        setattr(simulation, name, value)
+
+    try:
+        results = []
+        for seed in seeds:
+            session = run_headless(ticks, seed=seed)
+            results.append((
+                session.tick * SIMULATION_STEP,
+                session.current_level,
+                int(session.player.player_score) * 10,
+            ))
+    finally:
+        for name, value in defaults.items():
+            setattr(simulation, name, value)
+
+    return params, results
+
+
+def parameter_sets(settings):
+    """
+    Every combination of the values in settings, a {name: [values]} dict
+    """
+    names = list(settings)
+    for values in itertools.product(*(settings[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def parse_setting(text):
+    """
+    Parse a NAME=value,value,... argument
+    """
+    name, sep, values = text.partition("=")
+    if not sep or name not in TUNABLE:
+        raise argparse.ArgumentTypeError("expected NAME=value,... with NAME one of {}".format(", ".join(TUNABLE)))
+
+    parsed = []
+    for value in values.split(","):
+        try:
+            parsed.append(int(value))
+        except ValueError:
+            try:
+                parsed.append(float(value))
+            except ValueError:
+                raise argparse.ArgumentTypeError("{} is not a number".format(value))
+    return name, parsed
+
+
+def summary(results, ticks):
+    """
+    Distributions of the session results as text
+    """
+    results = np.array(results, np.float64)
+    lines = []
+    for column, name, value_format in ((0, "survival s", "{:8.1f}"), (1, "level", "{:8.1f}"), (2, "score", "{:8.0f}")):
+        values = results[:, column]
+        p10, p50, p90 = np.percentile(values, (10, 50, 90))
+        lines.append("  {:<10} mean {}  p10 {}  p50 {}  p90 {}".format(
+            name, *(value_format.format(v) for v in (values.mean(), p10, p50, p90))))
+
+    survived = np.count_nonzero(results[:, 0] >= ticks * SIMULATION_STEP)
+    lines.append("  {} of {} sessions survived until the tick limit".format(survived, len(results)))
+    return "\n".join(lines)
+
+
+def main():
+    """
+    Main method
+    """
+    parser = argparse.ArgumentParser(description="Tune the difficulty by playing many headless sessions")
+    parser.add_argument("--set", type=parse_setting, action="append", default=[], metavar="NAME=VALUES",
+                        help="comma separated values to try for a constant, can be given more than once")
+    parser.add_argument("--sessions", type=int, default=200, help="sessions to play per parameter set")
+    parser.add_argument("--ticks", type=int, default=5 * 60 * SIMULATION_RATE, help="maximum ticks per session")
+    parser.add_argument("--seed", type=int, default=None, help="seed the session seeds are drawn from")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    args = parser.parse_args()
+
+    settings = dict(args.set)
+    rng = random.Random(args.seed)
+    seeds = [rng.randrange(2**63) for i in range(args.sessions)]
+    batches = [seeds[i:i + BATCH_SIZE] for i in range(0, len(seeds), BATCH_SIZE)]
+
+    results = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as pool:
+        futures = [
+            pool.submit(play_sessions, params, batch, args.ticks)
+            for params in parameter_sets(settings)
+            for batch in batches
+        ]
+        for future in futures:
+            params, batch_results = future.result()
+            results.setdefault(tuple(params.items()), []).extend(batch_results)
+    elapsed = time.perf_counter() - start
+
+    for params, session_results in results.items():
+        name = ", ".join("{}={}".format(*item) for item in params) or "defaults"
+        print(name)
+        print(summary(session_results, args.ticks))
+
+    sessions = sum(len(r) for r in results.values())
+    print("{} sessions in {:.1f} s on {} workers".format(sessions, elapsed, args.workers))
+
+
+if __name__ == "__main__":
+    main()
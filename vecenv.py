@@ -0,0 +1,255 @@
+"""
+Vectorized environment for training agents, in the style of gym's vector envs.
+
+VecEnv runs num_envs independent sessions in lockstep in one process.
+The obstacles of all sessions live in one SharedObstacleStore, so they
+are moved in the same few NumPy operations every tick however many
+sessions there are, and the nearest obstacle features of all sessions
+are gathered in one pass too.
+
+    env = VecEnv(64, seed=1)
+    observations = env.reset()
+    observations, rewards, dones, info = env.step(actions)
+
+"""
+
+import random
+from functools import partial
+
+import numpy as np
+
+from simulation import (
+    OBSTACLE_AMOUNT,
+    SCREEN_HEIGHT,
+    SCREEN_WIDTH,
+    SIMULATION_RATE,
+    SIMULATION_STEP,
+    Inputs,
+    ObstacleStore,
+    Simulation,
+)
+
+# obstacles described in every observation, closest first
+NEAREST_OBSTACLES = 4
+# per obstacle: dx, dy, change_x, change_y, radius, is_harmless
+OBSTACLE_FEATURES = 6
+# x, y, lives, level, is_dashing, can_dash
+PLAYER_FEATURES = 6
+OBSERVATION_SIZE = PLAYER_FEATURES + NEAREST_OBSTACLES * OBSTACLE_FEATURES
+
+# ticks simulated per env step
+ACTION_REPEAT = 4
+# sessions are cut off after this many ticks
+MAX_TICKS = 5 * 60 * SIMULATION_RATE
+
+
+class SharedObstacleStore(ObstacleStore):
+    """
+    Obstacles of several sessions in one store.
+
+    Every obstacle remembers which env it belongs to, and envs use their
+    own layer of the spatial hash so they never collide with each other.
+    """
+
+    FIELDS = ObstacleStore.FIELDS + (("env", np.int64),)
+
+    def __init__(self, num_envs, capacity=0):
+        super().__init__(capacity=capacity)
+        # live obstacles per env
+        self.env_counts = np.zeros(num_envs, np.int64)
+
+    def cell_keys(self, s):
+        return self.grid.keys(self.center_x[s], self.center_y[s], self.env[s])
+
+    def spawn_for(self, env, rng, amount, spawn_on_edge=False, level=1):
+        if amount <= 0:
+            return self.next_id, self.next_id
+        return self.spawn_layout_for(env, self.generate(amount, spawn_on_edge, rng, level))
+
+    def spawn_layout_for(self, env, layout):
+        amount = len(layout["type"])
+        # env has to be set before spawn_layout puts the new slots into the grid
+        self.reserve(self.count + amount)
+        self.env[self.count:self.count + amount] = env
+        self.env_counts[env] += amount
+        return self.spawn_layout(layout)
+
+    def clear_env(self, env):
+        slots = np.flatnonzero(self.env[:self.count] == env)
+        if len(slots):
+            self._remove(slots)
+
+    def _remove(self, slots):
+        self.env_counts -= np.bincount(self.env[slots], minlength=len(self.env_counts))
+        super()._remove(slots)
+
+
+class ObstacleView:
+    """
+    One env's part of a SharedObstacleStore, with the methods Simulation needs
+    """
+
+    def __init__(self, store, env, rng):
+        self.store = store
+        self.env = env
+        self.rng = rng
+
+    def __len__(self):
+        return int(self.store.env_counts[self.env])
+
+    @property
+    def is_harmless(self):
+        return self.store.is_harmless
+
+    @property
+    def center_x(self):
+        return self.store.center_x
+
+    @property
+    def center_y(self):
+        return self.store.center_y
+
+    def clear(self):
+        self.store.clear_env(self.env)
+
+    def spawn(self, amount, spawn_on_edge=False, level=1):
+        return self.store.spawn_for(self.env, self.rng, amount, spawn_on_edge, level)
+
+    def prepare(self, amount, rng, level=1):
+        # the grid is shared, so the cells are only known once the obstacles join it
+        return self.store.generate(amount, False, rng, level)
+
+    def spawn_layout(self, layout):
+        return self.store.spawn_layout_for(self.env, layout)
+
+    def end_harmless(self, first_id, end_id):
+        # ids are unique across envs
+        self.store.end_harmless(first_id, end_id)
+
+    def on_update(self, delta_time):
+        # VecEnv moves the obstacles of all envs at once
+        pass
+
+    def colliding(self, x, y, radius):
+        return self.store.colliding(x, y, radius, layer=self.env)
+
+    def colliding_swept(self, x0, y0, x1, y1, radius):
+        return self.store.colliding_swept(x0, y0, x1, y1, radius, layer=self.env)
+
+
+def action_inputs(action):
+    """
+    Inputs for an (x, y, dash) action, x and y being -1, 0 or 1
+    """
+    x, y, dash = (int(a) for a in action)
+    return Inputs(left=x < 0, right=x > 0, up=y > 0, down=y < 0, dash=bool(dash))
+
+
+class VecEnv:
+    """
+    num_envs sessions stepped together.
+
+    step takes an int array of shape (num_envs, 3) with one (x, y, dash)
+    action per env and returns (observations, rewards, dones, info).
+    Rewards are the score gained during the step. Finished envs start a
+    new session right away, info["final_observation"] holds their last
+    observation and info["truncated"] tells which ones hit MAX_TICKS.
+    """
+
+    def __init__(self, num_envs, seed=None, delta_time=SIMULATION_STEP, action_repeat=ACTION_REPEAT,
+                 max_ticks=MAX_TICKS):
+        self.num_envs = num_envs
+        self.delta_time = delta_time
+        self.action_repeat = action_repeat
+        self.max_ticks = max_ticks
+
+        self.random = random.Random(seed)
+        self.obstacles = SharedObstacleStore(num_envs, num_envs * OBSTACLE_AMOUNT)
+        self.simulations = [None] * num_envs
+
+    def reset_env(self, env):
+        if self.simulations[env] is not None:
+            self.obstacles.clear_env(env)
+        seed = self.random.randrange(2 ** 63)
+        self.simulations[env] = Simulation(seed, partial(ObstacleView, self.obstacles, env))
+
+    def reset(self):
+        for env in range(self.num_envs):
+            self.reset_env(env)
+        return self.observations()
+
+    def step(self, actions):
+        simulations = self.simulations
+        scores = np.array([s.player.player_score for s in simulations])
+
+        inputs = [action_inputs(action) for action in actions]
+        for tick in range(self.action_repeat):
+            running = [(s, i) for s, i in zip(simulations, inputs) if not s.game_over]
+            if not running:
+                break
+            for simulation, env_inputs in running:
+                simulation.begin_step(self.delta_time, env_inputs)
+            self.obstacles.on_update(self.delta_time)
+            for simulation, env_inputs in running:
+                simulation.finish_step(self.delta_time)
+                # dash is a key press, only the first tick of the action presses it
+                env_inputs.dash = False
+
+        rewards = np.array([s.player.player_score for s in simulations]) - scores
+        terminated = np.array([s.game_over for s in simulations])
+        truncated = np.array([s.tick >= self.max_ticks for s in simulations]) & ~terminated
+        dones = terminated | truncated
+
+        observations = self.observations()
+        info = {"truncated": truncated}
+        if dones.any():
+            info["final_observation"] = observations[dones]
+            for env in np.flatnonzero(dones).tolist():
+                self.reset_env(env)
+            observations = self.observations()
+
+        return observations, rewards, dones, info
+
+    def observations(self):
+        """
+        Observations of all envs, an array of shape (num_envs, OBSERVATION_SIZE)
+        """
+        observations = np.zeros((self.num_envs, OBSERVATION_SIZE), np.float32)
+
+        player_x = np.array([s.player.center_x for s in self.simulations])
+        player_y = np.array([s.player.center_y for s in self.simulations])
+        observations[:, 0] = player_x / SCREEN_WIDTH
+        observations[:, 1] = player_y / SCREEN_HEIGHT
+        observations[:, 2] = [s.player.player_lives for s in self.simulations]
+        observations[:, 3] = [s.current_level for s in self.simulations]
+        observations[:, 4] = [s.player.is_dashing for s in self.simulations]
+        observations[:, 5] = [s.player.can_dash for s in self.simulations]
+
+        store = self.obstacles
+        n = store.count
+        if n == 0:
+            return observations
+
+        env = store.env[:n]
+        dx = store.center_x[:n] - player_x[env]
+        dy = store.center_y[:n] - player_y[env]
+        features = np.stack((
+            dx / SCREEN_WIDTH,
+            dy / SCREEN_HEIGHT,
+            store.change_x[:n],
+            store.change_y[:n],
+            store.radius[:n] / SCREEN_WIDTH,
+            store.is_harmless[:n],
+        ), axis=1)
+
+        # sort by env, then by distance, and keep the first few of every env
+        order = np.lexsort((dx * dx + dy * dy, env))
+        sorted_env = env[order]
+        starts = np.searchsorted(sorted_env, np.arange(self.num_envs))
+        rank = np.arange(n) - starts[sorted_env]
+        nearest = rank < NEAREST_OBSTACLES
+
+        nearest_features = np.zeros((self.num_envs, NEAREST_OBSTACLES, OBSTACLE_FEATURES), np.float32)
+        nearest_features[sorted_env[nearest], rank[nearest]] = features[order[nearest]]
+        observations[:, PLAYER_FEATURES:] = nearest_features.reshape(self.num_envs, -1)
+        return observations